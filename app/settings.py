@@ -54,9 +54,38 @@ NPM_BIN_PATH = "C:/Program Files/nodejs/npm.cmd"
 
 ASGI_APPLICATION = "app.asgi.application"
 CHANNEL_LAYERS = {
-    "default": {"BACKEND": "channels.layers.InMemoryChannelLayer"},
+    # Shared by every Daphne worker on this machine; see core.layers.
+    "default": {
+        "BACKEND": "core.layers.SQLiteChannelLayer",
+        "CONFIG": {"path": BASE_DIR / "channels.sqlite3"},
+    },
 }
 
+# Write-behind persistence for chat messages; see core.consumers.ChatConsumer.
+CHAT_FLUSH_INTERVAL = 0.25
+CHAT_FLUSH_BATCH_SIZE = 50
+CHAT_CONFIRM_PERSISTENCE = False
+# Run the consumer's transactional writes on the shared thread-sensitive
+# executor (True) or on the default thread pool (False).
+CHAT_DB_THREAD_SENSITIVE = True
+# Lifetime of a user's cached chat sidebar fragment; see core.sidebar.
+CHAT_SIDEBAR_CACHE_TIMEOUT = 300
+
+CACHES = {
+    # On disk so that an invalidation made by one Daphne or worker process
+    # is seen by the others on this machine; see core.sidebar.
+    "default": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": BASE_DIR / "cache",
+        "OPTIONS": {"MAX_ENTRIES": 10000},
+    },
+}
+
+# Weeks shown at a time on timetable and schedule pages, and how far ahead
+# recurring availability rules are turned into periods when one is viewed;
+# see core.models.AvailabilityRule.
+AVAILABILITY_WINDOW_WEEKS = 4
+
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -95,9 +124,45 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        # Reuse a connection across requests instead of reopening the file
+        # and rerunning SQLITE_PRAGMAS for every one.
+        "CONN_MAX_AGE": 600,
+        "CONN_HEALTH_CHECKS": True,
+        "OPTIONS": {
+            # Take the write lock when a transaction starts. A deferred
+            # transaction that reads first and then writes can't wait for the
+            # lock and fails with "database is locked" straight away.
+            "transaction_mode": "IMMEDIATE",
+        },
+        # Tests use a file too: threads sharing the default in-memory test
+        # database fail with "table is locked" instead of waiting.
+        "TEST": {"NAME": BASE_DIR / "test_db.sqlite3"},
     }
 }
 
+# Run on every new SQLite connection by core.signals.configure_sqlite.
+# Measure changes with `manage.py bench_sqlite`.
+SQLITE_PRAGMAS = {
+    # Readers and the writer no longer block each other.
+    "journal_mode": "wal",
+    # Milliseconds a writer waits for the lock before giving up.
+    "busy_timeout": 5000,
+    # With WAL, only a power loss can drop the last commits; never corrupts.
+    "synchronous": "normal",
+    # Negative means KiB: a 20 MB page cache per connection.
+    "cache_size": -20000,
+    "mmap_size": 128 * 1024 * 1024,
+    "temp_store": "memory",
+}
+
+# Send the hot writes in core.views and core.consumers to one writer thread
+# per process, which commits whatever is queued (up to DB_WRITER_MAX_BATCH
+# calls) in a single transaction; see core.writer. Off by default: only the
+# writes that call core.writer.run/arun go through it, and it only pays off
+# under heavy concurrent writing (see the bench_sqlite command).
+DB_SINGLE_WRITER = False
+DB_WRITER_MAX_BATCH = 64
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -156,6 +221,11 @@ ACCOUNT_SIGNUP_FORM_CLASS = "core.forms.ExpandedSignUpForm"
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
 MEDIA_URL = "/media/"
 
+# Spool uploads to disk and drop files over UPLOAD_MAX_FILE_SIZE bytes while
+# they stream in; see core.uploads.
+FILE_UPLOAD_HANDLERS = ["core.uploads.LimitedTemporaryFileUploadHandler"]
+UPLOAD_MAX_FILE_SIZE = 5 * 1024 * 1024
+
 if DEBUG:
     # Add django_browser_reload only in DEBUG mode
     INSTALLED_APPS += ["django_browser_reload"]
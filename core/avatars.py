@@ -0,0 +1,170 @@
+"""
+Fixed-size derivatives of profile pictures.
+
+``process`` crops a picture to a square and stores it at every size in
+``SIZES``, once as WebP and once as a JPEG fallback. File names are derived
+from the SHA-256 of the source bytes, so a name always refers to the same
+image: it can be served with a far-future cache lifetime, and users who
+upload the same picture (or keep the default one) share files.
+
+Each derivative has a ``Blob`` row holding one reference on behalf of the
+picture it was cut from. ``gc_media`` releases it when it deletes that
+picture, and then deletes the derivative like any other unreferenced blob.
+
+``normalize`` turns an untrusted upload into the picture that is stored:
+it is decoded and validated, rotated upright, stripped of its metadata and
+scaled down to ``MASTER_SIZE``. Uploads go through it in the
+``process_image_jobs`` worker rather than in the request; see
+``core.image_jobs``.
+"""
+
+import hashlib
+import io
+import posixpath
+import re
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+# Edge length in pixels, at twice the largest CSS size each one is shown at.
+SIZES = {
+    "small": 80,
+    "large": 400,
+}
+
+FORMATS = {
+    "webp": ("WEBP", {"quality": 80, "method": 6}),
+    "jpg": ("JPEG", {"quality": 85, "optimize": True, "progressive": True}),
+}
+
+DIGEST_LENGTH = 20
+
+# Longest edge of the stored picture that the sizes above are cut from.
+MASTER_SIZE = 1024
+ACCEPTED_FORMATS = {"JPEG", "PNG", "WEBP", "GIF"}
+# Refuse to decode anything larger, whatever the file size says.
+MAX_PIXELS = 40_000_000
+
+
+class InvalidImage(Exception):
+    """The upload is not a picture we can use; the message is shown to the user."""
+
+
+# The stem ContentAddressedStorage gives a stored file.
+CONTENT_ADDRESSED_STEM = re.compile(r"[0-9a-f]{64}")
+
+
+def name(digest, size, fmt):
+    return f"avatars/{digest[:2]}/{digest}-{SIZES[size]}.{fmt}"
+
+
+def derivative_names(digest):
+    return [name(digest, size, fmt) for size in SIZES for fmt in FORMATS]
+
+
+def stored_digest(name):
+    """
+    The digest of the picture stored as ``name`` if its name already holds
+    one, i.e. ``ContentAddressedStorage`` stored it; ``None`` otherwise.
+    """
+    stem = posixpath.splitext(posixpath.basename(name))[0]
+    if CONTENT_ADDRESSED_STEM.fullmatch(stem):
+        return stem[:DIGEST_LENGTH]
+    return None
+
+
+def url(digest, size, fmt):
+    return default_storage.url(name(digest, size, fmt))
+
+
+def flatten(image):
+    """Return ``image`` as RGB, compositing any transparency onto white."""
+    if image.mode in ("RGBA", "LA", "P"):
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, "white")
+        background.paste(image, mask=image.getchannel("A"))
+        return background
+    return image.convert("RGB")
+
+
+def render(data, missing):
+    from .models import Blob
+
+    with Image.open(io.BytesIO(data)) as source:
+        image = flatten(ImageOps.exif_transpose(source))
+    blobs = []
+    for size, fmt, target in missing:
+        edge = SIZES[size]
+        thumbnail = ImageOps.fit(image, (edge, edge), Image.Resampling.LANCZOS)
+        pil_format, params = FORMATS[fmt]
+        buffer = io.BytesIO()
+        # Nothing from the source's metadata is passed on to the derivative.
+        thumbnail.save(buffer, pil_format, **params)
+        # Files from before derivatives had Blob rows are kept as they are.
+        if not default_storage.exists(target):
+            default_storage.save(target, ContentFile(buffer.getvalue()))
+        blobs.append(
+            Blob(
+                name=target,
+                size=buffer.tell(),
+                references=1,
+                stored_at=timezone.now(),
+            )
+        )
+    # A worker racing on the same picture has registered the same files.
+    Blob.objects.bulk_create(blobs, ignore_conflicts=True)
+
+
+def process(field_file):
+    """
+    Create whichever derivatives of ``field_file`` don't exist yet and
+    return the digest that names them. The source is only read when some
+    are missing, and only hashed if its name doesn't hold the digest.
+    """
+    from .models import Blob
+
+    data = None
+    digest = stored_digest(field_file.name)
+    if digest is None:
+        with field_file.open("rb") as f:
+            data = f.read()
+        digest = hashlib.sha256(data).hexdigest()[:DIGEST_LENGTH]
+    names = derivative_names(digest)
+    registered = set(Blob.objects.filter(name__in=names).values_list("name", flat=True))
+    missing = [
+        (size, fmt, name(digest, size, fmt))
+        for size in SIZES
+        for fmt in FORMATS
+        if name(digest, size, fmt) not in registered
+    ]
+    if missing:
+        if data is None:
+            with field_file.open("rb") as f:
+                data = f.read()
+        render(data, missing)
+    return digest
+
+
+def normalize(file):
+    """
+    Decode the uploaded ``file`` and return it re-encoded as a JPEG no
+    larger than ``MASTER_SIZE``, without any of the source's metadata.
+    Raises ``InvalidImage`` if it isn't an image in ``ACCEPTED_FORMATS``.
+    """
+    try:
+        with Image.open(file) as source:
+            if source.format not in ACCEPTED_FORMATS:
+                raise InvalidImage("El formato de la imagen no es compatible.")
+            width, height = source.size
+            if width * height > MAX_PIXELS:
+                raise InvalidImage("La imagen tiene demasiados píxeles.")
+            source.draft("RGB", (MASTER_SIZE, MASTER_SIZE))
+            image = flatten(ImageOps.exif_transpose(source))
+    except (OSError, SyntaxError, Image.DecompressionBombError):
+        raise InvalidImage("El archivo no es una imagen válida.")
+    image.thumbnail((MASTER_SIZE, MASTER_SIZE), Image.Resampling.LANCZOS)
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=90, optimize=True, progressive=True)
+    return ContentFile(buffer.getvalue())
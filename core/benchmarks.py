@@ -0,0 +1,44 @@
+"""Helpers shared by the ``bench_*`` management commands."""
+
+import contextlib
+import io
+import os
+
+from django.db import connection
+
+
+def latency_summary(samples):
+    """Percentiles of ``samples`` (in ms), or ``None`` if there are none."""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+
+    def pct(p):
+        return round(ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))], 3)
+
+    return {
+        "p50": pct(50),
+        "p95": pct(95),
+        "p99": pct(99),
+        "max": round(ordered[-1], 3),
+    }
+
+
+@contextlib.contextmanager
+def scratch_database(directory):
+    """
+    Point the default connection at a fresh, migrated SQLite file inside
+    ``directory`` for the duration of the block, so benchmarks can hammer
+    a real file database (shareable with threads and forked processes)
+    without touching the project's data.
+    """
+    connection.settings_dict["TEST"]["NAME"] = os.path.join(
+        directory, "scratch.sqlite3"
+    )
+    # Migrations print as they emit post_migrate; keep reports clean.
+    with contextlib.redirect_stdout(io.StringIO()):
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
@@ -1,31 +1,141 @@
+import asyncio
+import datetime
 import json
+import logging
+from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
-from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from . import notifications
+from . import sidebar
+from . import writer
 from .models import ChatThread, Message, CustomUser
+from .rendering import render_message_html
+
+logger = logging.getLogger(__name__)
+
+# How many times disconnect tries to store the buffered messages.
+DISCONNECT_FLUSH_ATTEMPTS = 3
 
 
 class ChatConsumer(AsyncWebsocketConsumer):
+    """
+    Chat socket for one thread.
+
+    Messages are persisted write-behind: ``receive`` appends them to a
+    per-connection buffer that is written with a single ``bulk_create`` once
+    ``CHAT_FLUSH_BATCH_SIZE`` messages are waiting, ``CHAT_FLUSH_INTERVAL``
+    seconds after the first one arrived, or when the socket disconnects.
+    Flushes are serialized, and a flush that fails puts its batch back at
+    the front of the buffer and re-arms the timer to try again.
+
+    Ordering: a connection's messages are inserted in the order they were
+    received, so ids preserve it. ``Message.timestamp`` is the time the batch
+    was written, not the time the frame arrived.
+
+    Durability: by default a message is broadcast before it is stored, so a
+    crash can lose up to one flush interval of messages that recipients have
+    already seen. Set ``CHAT_CONFIRM_PERSISTENCE = True`` to flush every
+    message before broadcasting it instead.
+
+    Each flush bumps the recipients' unread counters, pushes their new
+    totals to ``NotificationConsumer`` and invalidates both participants'
+    cached sidebars. It then tells the thread's other sockets how many
+    messages it stored, and a socket of the reader folds exactly those out
+    of their unread counters.
+
+    Lookups use the async ORM. Writes go to the single writer in
+    ``core.writer`` when ``DB_SINGLE_WRITER`` is on, where flushes from every
+    socket are committed in shared transactions. Otherwise they run on the
+    shared thread-sensitive executor by default; set
+    ``CHAT_DB_THREAD_SENSITIVE = False`` to run them on the default thread
+    pool so chat writes don't queue behind each other and behind sync views.
+    """
+
     async def connect(self):
         self.thread_id = self.scope["url_route"]["kwargs"]["thread_id"]
         self.room_group_name = f"chat_{self.thread_id}"
+        self.pending = []
+        self.flush_handle = None
+        self.flush_task = None
+        self.flush_lock = asyncio.Lock()
+
+        self.flush_interval = getattr(settings, "CHAT_FLUSH_INTERVAL", 0.25)
+        self.flush_batch_size = getattr(settings, "CHAT_FLUSH_BATCH_SIZE", 50)
+        self.confirm_persistence = getattr(settings, "CHAT_CONFIRM_PERSISTENCE", False)
+        self.thread_sensitive = getattr(settings, "CHAT_DB_THREAD_SENSITIVE", True)
+
+        user = self.scope["user"]
+        self.thread = None
+        if user.is_authenticated:
+            self.thread = (
+                await ChatThread.objects.filter(Q(user1=user) | Q(user2=user))
+                .filter(id=self.thread_id)
+                .afirst()
+            )
+        if self.thread is None:
+            await self.close()
+            return
 
         await self.channel_layer.group_add(self.room_group_name, self.channel_name)
         await self.accept()
 
     async def disconnect(self, close_code):
-        await self.channel_layer.group_discard(self.room_group_name, self.channel_name)
+        if self.thread is None:
+            return
+        try:
+            await self.final_flush()
+        finally:
+            await self.channel_layer.group_discard(
+                self.room_group_name, self.channel_name
+            )
+
+    async def final_flush(self):
+        # No timer can retry once the socket is gone, so retry here.
+        for attempt in range(1, DISCONNECT_FLUSH_ATTEMPTS + 1):
+            try:
+                await self.flush()
+                return
+            except Exception:
+                logger.exception(
+                    "Flushing messages for chat %s on disconnect failed (attempt %d)",
+                    self.thread_id,
+                    attempt,
+                )
+            finally:
+                if self.flush_handle is not None:
+                    self.flush_handle.cancel()
+                    self.flush_handle = None
+            if attempt < DISCONNECT_FLUSH_ATTEMPTS:
+                await asyncio.sleep(self.flush_interval * attempt)
+        logger.error("Lost %d messages for chat %s", len(self.pending), self.thread_id)
 
     async def receive(self, text_data):
         data = json.loads(text_data)
         message_content = data["message"]
         user = self.scope["user"]
-        await self.save_message(user, message_content)
+        message_html = render_message_html(message_content)
+        self.pending.append(
+            Message(
+                thread=self.thread,
+                sender=user,
+                content=message_content,
+                content_html=message_html,
+            )
+        )
+        if self.confirm_persistence or len(self.pending) >= self.flush_batch_size:
+            await self.flush()
+        else:
+            self.arm_flush_timer()
         await self.channel_layer.group_send(
             self.room_group_name,
             {
                 "type": "chat_message",
                 "message": message_content,
+                "html": message_html,
                 "sender": user.full_name,
+                "sender_id": user.id,
             },
         )
 
@@ -34,13 +144,115 @@ class ChatConsumer(AsyncWebsocketConsumer):
             text_data=json.dumps(
                 {
                     "message": event["message"],
+                    "html": event["html"],
                     "sender": event["sender"],
                     "timestamp": "Just now",
                 }
             )
         )
 
-    @sync_to_async
-    def save_message(self, user, content):
-        thread = ChatThread.objects.get(id=self.thread_id)
-        Message.objects.create(thread=thread, sender=user, content=content)
+    def arm_flush_timer(self):
+        if self.flush_handle is None:
+            self.flush_handle = asyncio.get_running_loop().call_later(
+                self.flush_interval, self.start_timed_flush
+            )
+
+    def start_timed_flush(self):
+        self.flush_handle = None
+        # Keep a reference so the task isn't collected while it runs.
+        self.flush_task = asyncio.ensure_future(self.timed_flush())
+
+    async def timed_flush(self):
+        try:
+            await self.flush()
+        except Exception:
+            # flush() has put the batch back and re-armed the timer.
+            logger.exception("Flushing messages for chat %s failed", self.thread_id)
+
+    async def flush(self):
+        async with self.flush_lock:
+            if self.flush_handle is not None:
+                self.flush_handle.cancel()
+                self.flush_handle = None
+            if not self.pending:
+                return
+            batch, self.pending = self.pending, []
+            try:
+                recipients = await self.run_sync(self.save_messages, batch)
+            except Exception:
+                # Anything received meanwhile is newer than the batch.
+                self.pending[:0] = batch
+                self.arm_flush_timer()
+                raise
+        totals = CustomUser.objects.filter(pk__in=recipients).values_list(
+            "id", "unread_messages"
+        )
+        async for user_id, total in totals:
+            await notifications.push_unread(user_id, total)
+        await self.channel_layer.group_send(
+            self.room_group_name,
+            {
+                "type": "chat_stored",
+                "count": len(batch),
+                "sent_at": batch[-1].timestamp.isoformat(),
+                "sender_id": self.scope["user"].id,
+            },
+        )
+
+    async def chat_stored(self, event):
+        # The counters already include the batch, so folding exactly its
+        # messages out neither races the sender's flush nor recounts.
+        user = self.scope["user"]
+        if event["sender_id"] == user.id:
+            return
+        # Skip the write when another of the reader's sockets got here first.
+        unread = ChatThread.objects.filter(
+            pk=self.thread.pk, **{f"{self.thread.side(user)}_unread__gt": 0}
+        )
+        if not await unread.aexists():
+            return
+        sent_at = datetime.datetime.fromisoformat(event["sent_at"])
+        total = await self.run_sync(self.read_thread, user, event["count"], sent_at)
+        await notifications.push_unread(user.id, total)
+
+    def run_sync(self, func, *args):
+        if writer.enabled():
+            return writer.arun(func, *args)
+        # Closes connections past CONN_MAX_AGE around the call, as Django does
+        # around a request, since pool threads never see request_finished.
+        return database_sync_to_async(func, thread_sensitive=self.thread_sensitive)(
+            *args
+        )
+
+    def save_messages(self, messages):
+        participants = [self.thread.user1_id, self.thread.user2_id]
+        with transaction.atomic():
+            Message.objects.bulk_create(messages)
+            recipients = self.thread.record_messages(messages)
+            transaction.on_commit(lambda: sidebar.invalidate(participants))
+        return recipients
+
+    def read_thread(self, user, count, read_at):
+        total = self.thread.mark_read(user, count, read_at)
+        transaction.on_commit(lambda: sidebar.invalidate([user.id]))
+        return total
+
+
+class NotificationConsumer(AsyncWebsocketConsumer):
+    """Per-user socket that keeps the navbar's unread badge current."""
+
+    async def connect(self):
+        user = self.scope["user"]
+        if not user.is_authenticated:
+            await self.close()
+            return
+        self.group_name = notifications.user_group(user.id)
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, close_code):
+        if hasattr(self, "group_name"):
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def unread_update(self, event):
+        await self.send(text_data=json.dumps({"unread": event["unread"]}))
@@ -1,4 +1,8 @@
+import datetime
+
 from django import forms
+from django.db.models import Q
+
 from . import models
 
 
@@ -64,7 +68,8 @@ class ReviewForm(forms.Form):
 
 class UserProfileUpdateForm(forms.Form):
     full_name = forms.CharField(label="Nombre Completo", max_length=254)
-    profile_picture = forms.ImageField(
+    # Decoded and validated by the process_image_jobs worker, not here.
+    profile_picture = forms.FileField(
         label="Imagen de perfil",
         required=False,
         widget=forms.FileInput,
@@ -79,3 +84,94 @@ class UserProfileUpdateForm(forms.Form):
             }
         ),
     )
+
+
+class AvailabilityRuleForm(forms.Form):
+    weekday = forms.TypedChoiceField(
+        choices=models.AvailabilityRule.WEEKDAY_CHOICES, coerce=int, label="Día"
+    )
+    start_time = forms.TimeField(
+        label="Hora de inicio", widget=forms.TimeInput(attrs={"type": "time"})
+    )
+    end_time = forms.TimeField(
+        label="Hora de fin", widget=forms.TimeInput(attrs={"type": "time"})
+    )
+    starts_on = forms.DateField(
+        label="Desde", widget=forms.DateInput(attrs={"type": "date"})
+    )
+    ends_on = forms.DateField(
+        label="Hasta",
+        required=False,
+        widget=forms.DateInput(attrs={"type": "date"}),
+    )
+
+    def __init__(self, *args, owner=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.owner = owner
+
+    def clean(self):
+        cleaned_data = super().clean()
+        start_time = cleaned_data.get("start_time")
+        end_time = cleaned_data.get("end_time")
+        if start_time and end_time and start_time >= end_time:
+            raise forms.ValidationError(
+                "La hora de inicio debe ser anterior a la hora de fin."
+            )
+        starts_on = cleaned_data.get("starts_on")
+        ends_on = cleaned_data.get("ends_on")
+        if starts_on and ends_on and ends_on < starts_on:
+            raise forms.ValidationError(
+                "La fecha final debe ser posterior a la fecha de inicio."
+            )
+        if (
+            self.owner is not None
+            and cleaned_data.get("weekday") is not None
+            and start_time
+            and end_time
+            and starts_on
+        ):
+            self.check_overlap(cleaned_data)
+        return cleaned_data
+
+    def check_overlap(self, cleaned_data):
+        weekday = cleaned_data["weekday"]
+        start_time = cleaned_data["start_time"]
+        end_time = cleaned_data["end_time"]
+        starts_on = cleaned_data["starts_on"]
+        ends_on = cleaned_data.get("ends_on")
+
+        rules = models.AvailabilityRule.objects.filter(
+            owner=self.owner,
+            weekday=weekday,
+            start_time__lt=end_time,
+            end_time__gt=start_time,
+        ).filter(Q(ends_on__isnull=True) | Q(ends_on__gte=starts_on))
+        if ends_on:
+            rules = rules.filter(starts_on__lte=ends_on)
+        if rules.exists():
+            raise forms.ValidationError(
+                "Este horario se cruza con otra regla de disponibilidad."
+            )
+
+        # Only upcoming one-off periods matter: past dates are never
+        # materialized.
+        periods = models.Period.objects.filter(
+            owner=self.owner,
+            rule__isnull=True,
+            day__iso_week_day=weekday + 1,
+            day__gte=max(starts_on, datetime.date.today()),
+            start_time__lt=end_time,
+            end_time__gt=start_time,
+        )
+        if ends_on:
+            periods = periods.filter(day__lte=ends_on)
+        if periods.exists():
+            raise forms.ValidationError(
+                "Este horario se cruza con periodos ya publicados."
+            )
+
+
+class AvailabilitySearchForm(forms.Form):
+    course = forms.ChoiceField(choices=models.Tutorship.COURSE_CHOICES, label="Materia")
+    day = forms.DateField(label="Día", widget=forms.DateInput(attrs={"type": "date"}))
+    time = forms.TimeField(label="Hora", widget=forms.TimeInput(attrs={"type": "time"}))
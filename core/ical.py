@@ -0,0 +1,71 @@
+"""
+iCalendar (RFC 5545) serialization of timetable periods, written as an
+async generator so feeds can be streamed row by row under ASGI.
+"""
+
+import datetime
+
+from django.utils import timezone
+
+PRODID = "-//TesisLuis//Horario//ES"
+
+
+def escape(text):
+    return (
+        text.replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\n", "\\n")
+    )
+
+
+def fold(line):
+    """Split ``line`` into 75-octet chunks joined by CRLF + space."""
+    encoded = line.encode()
+    if len(encoded) <= 75:
+        return line + "\r\n"
+    chunks, start = [], 0
+    while start < len(encoded):
+        end = min(start + (75 if not chunks else 74), len(encoded))
+        # Never split a multi-byte UTF-8 sequence.
+        while end < len(encoded) and encoded[end] & 0xC0 == 0x80:
+            end -= 1
+        chunks.append(encoded[start:end].decode())
+        start = end
+    return "\r\n ".join(chunks) + "\r\n"
+
+
+def utc_stamp(moment):
+    return moment.astimezone(datetime.timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+
+def local_stamp(day, time):
+    return utc_stamp(timezone.make_aware(datetime.datetime.combine(day, time)))
+
+
+def period_summary(period, user):
+    if period.owner_id == user.pk:
+        if period.student is None:
+            return "Horario disponible"
+        return f"Clase con {period.student.full_name}"
+    return f"Clase con {period.owner.full_name}"
+
+
+async def timetable_lines(periods, user, name):
+    """
+    Yield the folded lines of a VCALENDAR holding ``periods``, an async
+    iterable such as ``QuerySet.aiterator()``.
+    """
+    yield "BEGIN:VCALENDAR\r\n"
+    yield "VERSION:2.0\r\n"
+    yield f"PRODID:{PRODID}\r\n"
+    yield fold(f"X-WR-CALNAME:{escape(name)}")
+    async for period in periods:
+        yield "BEGIN:VEVENT\r\n"
+        yield f"UID:period-{period.pk}@tesisluis\r\n"
+        yield f"DTSTAMP:{utc_stamp(period.updated_at)}\r\n"
+        yield f"DTSTART:{local_stamp(period.day, period.start_time)}\r\n"
+        yield f"DTEND:{local_stamp(period.day, period.end_time)}\r\n"
+        yield fold(f"SUMMARY:{escape(period_summary(period, user))}")
+        yield "END:VEVENT\r\n"
+    yield "END:VCALENDAR\r\n"
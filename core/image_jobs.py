@@ -0,0 +1,92 @@
+"""
+Background processing of uploaded profile pictures.
+
+``enqueue`` stores the upload in ``ImageJob`` and returns straight away.
+The ``process_image_jobs`` management command drains the table with
+``process_due``: each upload is run through ``avatars.normalize`` and
+``avatars.process``, then swapped in as the user's picture; a job without
+an upload just resizes the picture the user already has. Unusable
+uploads are rejected with a message for the user. Unexpected failures are
+retried with the same backoff as the email outbox.
+"""
+
+import os
+
+from django.utils import timezone
+
+from . import avatars
+from .models import ImageJob
+from .outbox import LEASE, retry_delay
+
+
+def enqueue(user, upload=None):
+    return ImageJob.objects.create(
+        user=user, upload=upload, next_attempt_at=timezone.now()
+    )
+
+
+def claim(batch_size, max_attempts):
+    """Reserve up to ``batch_size`` due jobs; see ``outbox.claim``."""
+    now = timezone.now()
+    lease_until = now + LEASE
+    due = ImageJob.objects.filter(
+        finished_at__isnull=True, next_attempt_at__lte=now, attempts__lt=max_attempts
+    )
+    ids = list(
+        due.order_by("next_attempt_at", "id").values_list("id", flat=True)[:batch_size]
+    )
+    due.filter(id__in=ids).update(next_attempt_at=lease_until)
+    return list(
+        ImageJob.objects.filter(id__in=ids, next_attempt_at=lease_until)
+        .select_related("user")
+        .order_by("id")
+    )
+
+
+def apply(job):
+    """Replace the user's picture with the processed upload."""
+    # A newer upload by the same user makes this one moot.
+    newer = ImageJob.objects.filter(user_id=job.user_id, id__gt=job.id)
+    if newer.exclude(upload="").exists():
+        return
+    if not job.upload:
+        job.user.process_avatar()
+        return
+    picture = avatars.normalize(job.upload)
+    user = job.user
+    stem = os.path.splitext(os.path.basename(job.upload.name))[0]
+    user.profile_picture.save(f"{stem}.jpg", picture, save=False)
+    user.avatar_digest = avatars.process(user.profile_picture)
+    user.save(update_fields=["profile_picture", "avatar_digest"])
+
+
+def process_due(batch_size=10, max_attempts=5):
+    """Process one batch of due jobs. Returns ``(done, failed)``."""
+    done = failed = 0
+    for job in claim(batch_size, max_attempts):
+        now = timezone.now()
+        try:
+            apply(job)
+        except avatars.InvalidImage as exc:
+            ImageJob.objects.filter(id=job.id).update(
+                finished_at=now, error=str(exc), last_error=repr(exc)
+            )
+        except Exception as exc:
+            attempts = job.attempts + 1
+            update = {
+                "attempts": attempts,
+                "next_attempt_at": now + retry_delay(attempts),
+                "last_error": repr(exc),
+            }
+            if attempts >= max_attempts:
+                # Out of retries: stop showing the upload as pending.
+                update.update(finished_at=now, error="No se pudo procesar la imagen.")
+            ImageJob.objects.filter(id=job.id).update(**update)
+            failed += 1
+            continue
+        else:
+            ImageJob.objects.filter(id=job.id).update(finished_at=now, last_error="")
+        if job.upload:
+            job.upload.delete(save=False)
+        done += 1
+    return done, failed
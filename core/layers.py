@@ -0,0 +1,335 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import time
+import uuid
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+from channels.exceptions import ChannelFull
+from channels.layers import BaseChannelLayer
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS channel_messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    channel TEXT NOT NULL,
+    expires REAL NOT NULL,
+    body TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS channel_messages_channel ON channel_messages (channel, id);
+CREATE TABLE IF NOT EXISTS channel_groups (
+    grp TEXT NOT NULL,
+    channel TEXT NOT NULL,
+    joined REAL NOT NULL,
+    PRIMARY KEY (grp, channel)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS channel_groups_channel ON channel_groups (channel);
+"""
+
+logger = logging.getLogger(__name__)
+
+
+class _Receiver:
+    """Per-event-loop set of channels this process is currently waiting on."""
+
+    def __init__(self):
+        self.queues = {}
+        self.task = None
+
+
+class SQLiteChannelLayer(BaseChannelLayer):
+    """
+    Channel layer shared by every worker process on one machine through a
+    WAL-mode SQLite file, so ``group_send`` reaches sockets held by other
+    Daphne processes without running Redis.
+
+    Each process runs a single poller per event loop that claims pending
+    messages for all of its waiting channels in one ``DELETE ... RETURNING``
+    statement, backing off from ``poll_interval`` to ``max_poll_interval``
+    while idle. Sends to a channel that is being received on in the same
+    process skip the database entirely. Messages must be JSON-serializable.
+
+    Ordering: messages from one sender to one channel arrive in order. Like
+    the Redis layer, nothing is guaranteed across different senders.
+    """
+
+    extensions = ["groups", "flush"]
+
+    def __init__(
+        self,
+        path="channels.sqlite3",
+        expiry=60,
+        group_expiry=86400,
+        capacity=100,
+        channel_capacity=None,
+        poll_interval=0.002,
+        max_poll_interval=0.05,
+        **kwargs,
+    ):
+        super().__init__(
+            expiry=expiry,
+            capacity=capacity,
+            channel_capacity=channel_capacity,
+            **kwargs,
+        )
+        self.channel_capacity = self.compile_capacities(self.channel_capacity)
+        self.path = str(path)
+        self.group_expiry = group_expiry
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.client_prefix = uuid.uuid4().hex[:12]
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="sqlite-channel-layer"
+        )
+        self._connection = None
+        self._receivers = weakref.WeakKeyDictionary()
+        self._last_cleanup = 0.0
+
+    # Database access, always on the layer's single executor thread
+
+    def _db(self):
+        if self._connection is None:
+            connection = sqlite3.connect(
+                self.path, isolation_level=None, check_same_thread=False
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute("PRAGMA busy_timeout=5000")
+            connection.executescript(SCHEMA)
+            self._connection = connection
+        return self._connection
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    def _insert(self, rows):
+        db = self._db()
+        with db:
+            db.execute("BEGIN IMMEDIATE")
+            accepted = []
+            for channel, body in rows:
+                (pending,) = db.execute(
+                    "SELECT COUNT(*) FROM channel_messages WHERE channel = ?",
+                    (channel,),
+                ).fetchone()
+                if pending >= self.get_capacity(channel):
+                    continue
+                accepted.append((channel, time.time() + self.expiry, body))
+            db.executemany(
+                "INSERT INTO channel_messages (channel, expires, body) VALUES (?, ?, ?)",
+                accepted,
+            )
+        return {channel for channel, _, _ in accepted}
+
+    def _claim(self, room):
+        """
+        Delete and return the oldest pending messages of each channel in
+        ``room``, at most as many as its receive queue has room for.
+        """
+        rows = (
+            self._db()
+            .execute(
+                "DELETE FROM channel_messages WHERE id IN ("
+                " SELECT pending.id FROM ("
+                "  SELECT id, channel,"
+                "   ROW_NUMBER() OVER (PARTITION BY channel ORDER BY id) AS n"
+                "  FROM channel_messages"
+                "  WHERE channel IN (SELECT key FROM json_each(:room))"
+                "  AND expires > :now"
+                " ) AS pending JOIN json_each(:room) AS free"
+                " ON free.key = pending.channel WHERE pending.n <= free.value"
+                ") RETURNING id, channel, body",
+                {"room": json.dumps(room), "now": time.time()},
+            )
+            .fetchall()
+        )
+        # RETURNING yields rows in no particular order.
+        rows.sort()
+        return rows
+
+    def _group_members(self, group):
+        cutoff = time.time() - self.group_expiry
+        return [
+            channel
+            for (channel,) in self._db().execute(
+                "SELECT channel FROM channel_groups WHERE grp = ? AND joined > ?",
+                (group, cutoff),
+            )
+        ]
+
+    def _cleanup(self):
+        db = self._db()
+        now = time.time()
+        with db:
+            db.execute("BEGIN IMMEDIATE")
+            # A channel with expired messages has nobody reading it any more
+            # (e.g. its worker died), so drop it from its groups too.
+            db.execute(
+                "DELETE FROM channel_groups WHERE channel IN "
+                "(SELECT channel FROM channel_messages WHERE expires <= ?)",
+                (now,),
+            )
+            db.execute("DELETE FROM channel_messages WHERE expires <= ?", (now,))
+            db.execute(
+                "DELETE FROM channel_groups WHERE joined <= ?",
+                (now - self.group_expiry,),
+            )
+
+    # Channel layer API
+
+    async def send(self, channel, message):
+        assert isinstance(message, dict), "message is not a dict"
+        self.require_valid_channel_name(channel)
+        assert "__asgi_channel__" not in message
+
+        if self._deliver_locally(channel, message):
+            return
+        body = json.dumps(message)
+        if not await self._run(self._insert, [(channel, body)]):
+            raise ChannelFull(channel)
+
+    async def receive(self, channel):
+        self.require_valid_channel_name(channel)
+        receiver = self._receiver()
+        queue = receiver.queues.get(channel)
+        if queue is None:
+            queue = receiver.queues[channel] = asyncio.Queue(
+                maxsize=self.get_capacity(channel)
+            )
+        if receiver.task is None or receiver.task.done():
+            receiver.task = asyncio.create_task(self._poll(receiver))
+        try:
+            return await queue.get()
+        finally:
+            if queue.empty() and not queue._getters:
+                receiver.queues.pop(channel, None)
+
+    async def new_channel(self, prefix="specific"):
+        return f"{prefix}.{self.client_prefix}!{uuid.uuid4().hex}"
+
+    async def flush(self):
+        def _flush():
+            db = self._db()
+            with db:
+                db.execute("DELETE FROM channel_messages")
+                db.execute("DELETE FROM channel_groups")
+
+        await self._run(_flush)
+
+    async def close(self):
+        for receiver in list(self._receivers.values()):
+            if receiver.task is not None:
+                receiver.task.cancel()
+        if self._connection is not None:
+            await self._run(self._connection.close)
+            self._connection = None
+
+    # Groups extension
+
+    async def group_add(self, group, channel):
+        self.require_valid_group_name(group)
+        self.require_valid_channel_name(channel)
+
+        def _add():
+            with self._db() as db:
+                db.execute(
+                    "INSERT OR REPLACE INTO channel_groups (grp, channel, joined) "
+                    "VALUES (?, ?, ?)",
+                    (group, channel, time.time()),
+                )
+
+        await self._run(_add)
+
+    async def group_discard(self, group, channel):
+        self.require_valid_channel_name(channel)
+        self.require_valid_group_name(group)
+
+        def _discard():
+            with self._db() as db:
+                db.execute(
+                    "DELETE FROM channel_groups WHERE grp = ? AND channel = ?",
+                    (group, channel),
+                )
+
+        await self._run(_discard)
+
+    async def group_send(self, group, message):
+        assert isinstance(message, dict), "Message is not a dict"
+        self.require_valid_group_name(group)
+
+        members = await self._run(self._group_members, group)
+        body = None
+        remote = []
+        # Full channels are skipped silently, as in the other layers.
+        for channel in members:
+            try:
+                if self._deliver_locally(channel, message):
+                    continue
+            except ChannelFull:
+                continue
+            body = body or json.dumps(message)
+            remote.append((channel, body))
+        if remote:
+            await self._run(self._insert, remote)
+
+    # Local delivery and polling
+
+    def _receiver(self):
+        loop = asyncio.get_running_loop()
+        receiver = self._receivers.get(loop)
+        if receiver is None:
+            receiver = self._receivers[loop] = _Receiver()
+        return receiver
+
+    def _deliver_locally(self, channel, message):
+        try:
+            receiver = self._receiver()
+        except RuntimeError:
+            return False
+        queue = receiver.queues.get(channel)
+        if queue is None:
+            return False
+        try:
+            queue.put_nowait(json.loads(json.dumps(message)))
+        except asyncio.QueueFull:
+            raise ChannelFull(channel)
+        return True
+
+    async def _poll(self, receiver):
+        delay = self.poll_interval
+        while receiver.queues:
+            if time.time() - self._last_cleanup > self.expiry:
+                self._last_cleanup = time.time()
+                await self._run(self._cleanup)
+
+            room = {
+                channel: queue.maxsize - queue.qsize()
+                for channel, queue in receiver.queues.items()
+                if not queue.full()
+            }
+            rows = await self._run(self._claim, room) if room else []
+            returned = []
+            for _, channel, body in rows:
+                queue = receiver.queues.get(channel)
+                try:
+                    if queue is None:
+                        # The receiver went away between claim and dispatch.
+                        raise asyncio.QueueFull
+                    queue.put_nowait(json.loads(body))
+                except asyncio.QueueFull:
+                    # Or local sends filled its queue meanwhile. Put the
+                    # message back for whoever receives on it next.
+                    returned.append((channel, body))
+            if returned:
+                accepted = await self._run(self._insert, returned)
+                for channel, _ in returned:
+                    if channel not in accepted:
+                        logger.warning("Dropped a message for full channel %s", channel)
+
+            if rows:
+                delay = self.poll_interval
+            else:
+                delay = min(delay * 2, self.max_poll_interval)
+            await asyncio.sleep(delay)
@@ -0,0 +1,29 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+
+from core.models import PeriodHistory
+
+
+class Command(BaseCommand):
+    help = (
+        "Fold periods older than --weeks weeks into per-tutor weekly booking "
+        "statistics and delete them. Meant to run periodically, e.g. from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--weeks", type=int, default=12)
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        today = datetime.date.today()
+        # Archive whole weeks only, so a week's statistics land in one go.
+        this_monday = today - datetime.timedelta(today.weekday())
+        before = this_monday - datetime.timedelta(weeks=options["weeks"])
+
+        total = 0
+        while archived := PeriodHistory.archive(before, options["batch_size"]):
+            total += archived
+        self.stdout.write(
+            self.style.SUCCESS(f"Archived {total} periods dated before {before}.")
+        )
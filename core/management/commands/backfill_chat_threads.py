@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Substr
+
+from core.models import ChatThread, Message
+
+
+class Command(BaseCommand):
+    help = "Recompute the last-message metadata of every chat thread."
+
+    def handle(self, *args, **options):
+        latest = Message.objects.filter(thread=OuterRef("pk")).order_by(
+            "-timestamp", "-id"
+        )[:1]
+        updated = ChatThread.objects.update(
+            last_message_at=Subquery(latest.values("timestamp")),
+            last_message_preview=Coalesce(
+                Subquery(
+                    latest.values(
+                        preview=Substr("content", 1, ChatThread.PREVIEW_LENGTH)
+                    )
+                ),
+                Value(""),
+            ),
+            last_sender=Subquery(latest.values("sender")),
+        )
+        self.stdout.write(self.style.SUCCESS(f"Backfilled {updated} chat threads."))
@@ -0,0 +1,141 @@
+import datetime
+import tempfile
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+
+from core.benchmarks import scratch_database
+from core.models import CustomUser, Period
+
+
+def _naive_book(pk, student):
+    # The read-check-save path book_period used before Period.book.
+    period = Period.objects.get(pk=pk)
+    if period.student is not None or period.owner_id == student.pk:
+        return False
+    period.student = student
+    period.save()
+    return True
+
+
+def _naive_cancel(pk, user):
+    period = Period.objects.get(pk=pk)
+    if period.student is None or user.pk not in (period.owner_id, period.student_id):
+        return False
+    period.student = None
+    period.save()
+    return True
+
+
+class Command(BaseCommand):
+    help = (
+        "Race many students for one Period and check exactly one booking "
+        "wins, then measure booking and cancel throughput."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--contenders", type=int, default=300)
+        parser.add_argument("--rounds", type=int, default=5)
+        parser.add_argument("--slots", type=int, default=2000)
+        parser.add_argument("--workers", type=int, default=8)
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as tmp, scratch_database(tmp):
+            self.tutor = CustomUser.objects.create(
+                email="tutor@example.com", full_name="Tutor", is_tutor=True
+            )
+            self.students = CustomUser.objects.bulk_create(
+                [
+                    CustomUser(email=f"student{i}@example.com", full_name=f"S{i}")
+                    for i in range(max(options["contenders"], options["workers"]))
+                ]
+            )
+
+            for label, book in (("cas", Period.book), ("naive", _naive_book)):
+                for round_ in range(options["rounds"]):
+                    winners, errors = self.contention(book, options["contenders"])
+                    self.stdout.write(
+                        f"{label:5} round {round_}: {winners} of "
+                        f"{options['contenders']} bookings won, {errors} errors"
+                    )
+                    if label == "cas" and winners != 1:
+                        raise CommandError(
+                            f"Expected exactly one winner, got {winners}"
+                        )
+
+            for label, book, cancel in (
+                ("cas", Period.book, Period.cancel),
+                ("naive", _naive_book, _naive_cancel),
+            ):
+                booked, cancelled = self.throughput(
+                    book, cancel, options["slots"], options["workers"]
+                )
+                self.stdout.write(
+                    f"{label:5} throughput: {booked:.0f} bookings/s, "
+                    f"{cancelled:.0f} cancels/s "
+                    f"({options['slots']} slots, {options['workers']} workers)"
+                )
+
+    def create_slots(self, count):
+        start = datetime.date.today()
+        return Period.objects.bulk_create(
+            [
+                Period(
+                    owner=self.tutor,
+                    day=start + datetime.timedelta(days=i // 10),
+                    start_time=datetime.time(8 + i % 10),
+                    end_time=datetime.time(9 + i % 10),
+                )
+                for i in range(count)
+            ]
+        )
+
+    def run_threads(self, count, target):
+        barrier = threading.Barrier(count)
+        results = [None] * count
+
+        def worker(index):
+            barrier.wait()
+            try:
+                results[index] = target(index)
+            except OperationalError:
+                results[index] = "error"
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results, time.perf_counter() - started
+
+    def contention(self, book, contenders):
+        (slot,) = self.create_slots(1)
+        results, _ = self.run_threads(
+            contenders, lambda i: book(slot.pk, self.students[i])
+        )
+        winners = [i for i, won in enumerate(results) if won is True]
+        slot.refresh_from_db()
+        if len(winners) == 1 and slot.student_id != self.students[winners[0]].pk:
+            raise CommandError("The winning booking is not the one stored")
+        return len(winners), results.count("error")
+
+    def throughput(self, book, cancel, slots, workers):
+        pks = [slot.pk for slot in self.create_slots(slots)]
+
+        def run(operation):
+            def target(index):
+                student = self.students[index]
+                return sum(operation(pk, student) for pk in pks[index::workers])
+
+            results, elapsed = self.run_threads(workers, target)
+            done = sum(r for r in results if r != "error")
+            if done != slots:
+                raise CommandError(f"Only {done} of {slots} operations succeeded")
+            return slots / elapsed
+
+        return run(book), run(cancel)
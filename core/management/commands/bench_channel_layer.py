@@ -0,0 +1,126 @@
+import asyncio
+import multiprocessing
+import os
+import statistics
+import tempfile
+import time
+
+from channels.layers import InMemoryChannelLayer
+from django.core.management.base import BaseCommand
+
+from core.layers import SQLiteChannelLayer
+
+
+def _echo_worker(path, ready):
+    # Runs in a separate process: bounce every message on "bench.child" back
+    # to "bench.parent" so the parent can time a cross-process round trip.
+    async def main():
+        layer = SQLiteChannelLayer(path=path)
+        ready.set()
+        while True:
+            message = await layer.receive("bench.child")
+            if message.get("stop"):
+                break
+            await layer.send("bench.parent", message)
+        await layer.close()
+
+    asyncio.run(main())
+
+
+def _percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class Command(BaseCommand):
+    help = "Compare latency and throughput of the in-memory and SQLite channel layers."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--messages", type=int, default=2000)
+        parser.add_argument("--group-size", type=int, default=20)
+
+    def handle(self, *args, **options):
+        messages = options["messages"]
+        group_size = options["group_size"]
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "bench.sqlite3")
+            layers = {
+                "in-memory": lambda: InMemoryChannelLayer(capacity=messages),
+                "sqlite": lambda: SQLiteChannelLayer(path=path, capacity=messages),
+            }
+            for name, make_layer in layers.items():
+                latency = asyncio.run(self.latency(make_layer(), messages))
+                self.report(f"{name} same-process", latency)
+                rate = asyncio.run(
+                    self.group_throughput(make_layer(), messages, group_size)
+                )
+                self.stdout.write(
+                    f"  group_send to {group_size} members: {rate:,.0f} deliveries/s"
+                )
+
+            latency = self.cross_process_latency(path, messages)
+            self.report("sqlite cross-process", latency)
+
+    def report(self, label, samples):
+        self.stdout.write(
+            f"{label}: p50 {statistics.median(samples) * 1000:.3f} ms, "
+            f"p99 {_percentile(samples, 99) * 1000:.3f} ms, "
+            f"{len(samples) / sum(samples):,.0f} round trips/s"
+        )
+
+    async def latency(self, layer, messages):
+        channel = await layer.new_channel()
+        samples = []
+        for i in range(messages):
+            receiving = asyncio.create_task(layer.receive(channel))
+            await asyncio.sleep(0)
+            start = time.perf_counter()
+            await layer.send(channel, {"type": "bench", "n": i})
+            await receiving
+            samples.append(time.perf_counter() - start)
+        await layer.flush()
+        await layer.close()
+        return samples
+
+    async def group_throughput(self, layer, messages, group_size):
+        channels = [await layer.new_channel() for _ in range(group_size)]
+        for channel in channels:
+            await layer.group_add("bench", channel)
+
+        async def drain(channel):
+            for _ in range(messages):
+                await layer.receive(channel)
+
+        start = time.perf_counter()
+        receivers = [asyncio.create_task(drain(channel)) for channel in channels]
+        for i in range(messages):
+            await layer.group_send("bench", {"type": "bench", "n": i})
+        await asyncio.gather(*receivers)
+        elapsed = time.perf_counter() - start
+        await layer.flush()
+        await layer.close()
+        return messages * group_size / elapsed
+
+    def cross_process_latency(self, path, messages):
+        context = multiprocessing.get_context("spawn")
+        ready = context.Event()
+        worker = context.Process(target=_echo_worker, args=(path, ready))
+        worker.start()
+        ready.wait()
+
+        async def main():
+            layer = SQLiteChannelLayer(path=path)
+            samples = []
+            for i in range(messages):
+                start = time.perf_counter()
+                await layer.send("bench.child", {"type": "bench", "n": i})
+                await layer.receive("bench.parent")
+                samples.append(time.perf_counter() - start)
+            await layer.send("bench.child", {"stop": True})
+            await layer.close()
+            return samples
+
+        samples = asyncio.run(main())
+        worker.join()
+        return samples
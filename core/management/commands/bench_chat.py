@@ -0,0 +1,325 @@
+import asyncio
+import base64
+import json
+import os
+import struct
+import tempfile
+import time
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test.utils import override_settings
+
+from core.benchmarks import latency_summary, scratch_database
+from core.models import ChatThread, CustomUser, Message
+
+
+class CommunicatorSocket:
+    """Drives ``app.asgi.application`` in-process, without a network hop."""
+
+    def __init__(self, path, cookie):
+        from channels.testing import WebsocketCommunicator
+
+        from app.asgi import application
+
+        self.communicator = WebsocketCommunicator(
+            application, path, headers=[(b"cookie", cookie.encode())]
+        )
+
+    async def connect(self):
+        connected, _ = await self.communicator.connect()
+        return connected
+
+    async def send(self, text):
+        await self.communicator.send_to(text_data=text)
+
+    async def receive(self):
+        return await self.communicator.receive_from(timeout=3600)
+
+    async def close(self):
+        await self.communicator.disconnect()
+
+
+class DaphneSocket:
+    """
+    Minimal RFC 6455 client over asyncio streams for talking to a real Daphne
+    server. Daphne pins txaio to twisted, so autobahn's asyncio client can't
+    be used in the same process.
+    """
+
+    def __init__(self, path, cookie, port):
+        self.path = path
+        self.cookie = cookie
+        self.port = port
+
+    async def connect(self):
+        self.reader, self.writer = await asyncio.open_connection("127.0.0.1", self.port)
+        key = base64.b64encode(os.urandom(16)).decode()
+        self.writer.write(
+            (
+                f"GET {self.path} HTTP/1.1\r\n"
+                f"Host: 127.0.0.1:{self.port}\r\n"
+                "Upgrade: websocket\r\n"
+                "Connection: Upgrade\r\n"
+                f"Sec-WebSocket-Key: {key}\r\n"
+                "Sec-WebSocket-Version: 13\r\n"
+                f"Cookie: {self.cookie}\r\n\r\n"
+            ).encode()
+        )
+        response = await self.reader.readuntil(b"\r\n\r\n")
+        return response.startswith(b"HTTP/1.1 101")
+
+    def write_frame(self, opcode, payload):
+        header = bytes([0x80 | opcode])
+        length = len(payload)
+        if length < 126:
+            header += bytes([0x80 | length])
+        elif length < 1 << 16:
+            header += bytes([0x80 | 126]) + struct.pack("!H", length)
+        else:
+            header += bytes([0x80 | 127]) + struct.pack("!Q", length)
+        mask = os.urandom(4)
+        masked = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+        self.writer.write(header + mask + masked)
+
+    async def send(self, text):
+        self.write_frame(0x1, text.encode())
+        await self.writer.drain()
+
+    async def receive(self):
+        while True:
+            first, second = await self.reader.readexactly(2)
+            length = second & 0x7F
+            if length == 126:
+                (length,) = struct.unpack("!H", await self.reader.readexactly(2))
+            elif length == 127:
+                (length,) = struct.unpack("!Q", await self.reader.readexactly(8))
+            payload = await self.reader.readexactly(length)
+            if first & 0x0F == 0x1:
+                return payload.decode()
+
+    async def close(self):
+        self.write_frame(0x8, struct.pack("!H", 1000))
+        await self.writer.drain()
+        self.writer.close()
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test ChatConsumer: open N sockets across M chat threads, send "
+        "messages at a fixed rate and report latency and throughput as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sockets", type=int, default=50)
+        parser.add_argument("--threads", type=int, default=10)
+        parser.add_argument(
+            "--rate", type=float, default=2.0, help="Messages per second per socket."
+        )
+        parser.add_argument("--duration", type=float, default=10.0)
+        parser.add_argument(
+            "--daphne",
+            action="store_true",
+            help="Serve the application from a real Daphne process over TCP.",
+        )
+        parser.add_argument(
+            "--layer",
+            choices=["sqlite", "inmemory"],
+            default="sqlite",
+            help="Channel layer backend to run against.",
+        )
+        parser.add_argument(
+            "--thread-pool",
+            action="store_true",
+            help="Run the consumer's sync writes with CHAT_DB_THREAD_SENSITIVE "
+            "off, on the default thread pool.",
+        )
+        parser.add_argument("--output", help="Write the JSON report to this file.")
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as tmp:
+            if options["layer"] == "sqlite":
+                layer = {
+                    "BACKEND": "core.layers.SQLiteChannelLayer",
+                    "CONFIG": {"path": os.path.join(tmp, "channels.sqlite3")},
+                }
+            else:
+                layer = {"BACKEND": "channels.layers.InMemoryChannelLayer"}
+
+            with scratch_database(tmp):
+                overrides = {"CHANNEL_LAYERS": {"default": layer}}
+                if options["thread_pool"]:
+                    overrides["CHAT_DB_THREAD_SENSITIVE"] = False
+                with override_settings(**overrides):
+                    report = self.run_benchmark(options)
+
+        output = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                f.write(output + "\n")
+        self.stdout.write(output)
+
+    def run_benchmark(self, options):
+        threads, cookies = self.create_fixtures(options["threads"])
+        sockets = [
+            (
+                threads[i % len(threads)],
+                cookies[i % len(threads)][(i // len(threads)) % 2],
+            )
+            for i in range(options["sockets"])
+        ]
+
+        if not options["daphne"]:
+            results = asyncio.run(
+                self.drive(
+                    sockets,
+                    lambda path, cookie: CommunicatorSocket(path, cookie),
+                    options,
+                )
+            )
+        else:
+            from daphne.testing import DaphneProcess
+
+            def get_application():
+                from app.asgi import application
+
+                return application
+
+            connections.close_all()
+            server = DaphneProcess("127.0.0.1", get_application)
+            server.start()
+            try:
+                if not server.ready.wait(10):
+                    raise RuntimeError("Daphne did not start")
+                port = server.port.value
+                results = asyncio.run(
+                    self.drive(
+                        sockets,
+                        lambda path, cookie: DaphneSocket(path, cookie, port),
+                        options,
+                    )
+                )
+            finally:
+                server.terminate()
+                server.join()
+
+        return {
+            "mode": "daphne" if options["daphne"] else "communicator",
+            "layer": options["layer"],
+            "sockets": options["sockets"],
+            "threads": options["threads"],
+            "rate_per_socket": options["rate"],
+            "duration_s": options["duration"],
+            "chat_flush_interval_s": getattr(settings, "CHAT_FLUSH_INTERVAL", None),
+            "chat_flush_batch_size": getattr(settings, "CHAT_FLUSH_BATCH_SIZE", None),
+            "chat_confirm_persistence": getattr(
+                settings, "CHAT_CONFIRM_PERSISTENCE", None
+            ),
+            "chat_db_thread_sensitive": getattr(
+                settings, "CHAT_DB_THREAD_SENSITIVE", True
+            ),
+            **results,
+        }
+
+    def create_fixtures(self, thread_count):
+        users = CustomUser.objects.bulk_create(
+            [
+                CustomUser(email=f"bench{i}@example.com", full_name=f"Bench {i}")
+                for i in range(thread_count * 2)
+            ]
+        )
+        for user in users:
+            user.set_unusable_password()
+        CustomUser.objects.bulk_update(users, ["password"])
+
+        threads, cookies = [], []
+        for i in range(thread_count):
+            user1, user2 = users[2 * i], users[2 * i + 1]
+            threads.append(ChatThread.objects.create(user1=user1, user2=user2))
+            cookies.append([self.session_cookie(user1), self.session_cookie(user2)])
+        return threads, cookies
+
+    def session_cookie(self, user):
+        session = SessionStore()
+        session[SESSION_KEY] = str(user.pk)
+        session[BACKEND_SESSION_KEY] = "django.contrib.auth.backends.ModelBackend"
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.create()
+        return f"{settings.SESSION_COOKIE_NAME}={session.session_key}"
+
+    async def drive(self, sockets, make_socket, options):
+        from asgiref.sync import sync_to_async
+
+        interval = 1 / options["rate"]
+        duration = options["duration"]
+        connect_ms, delivery_ms = [], []
+        sent = 0
+        delivered = 0
+
+        clients = []
+        for index, (thread, cookie) in enumerate(sockets):
+            client = make_socket(f"/ws/chat/{thread.id}/", cookie)
+            start = time.perf_counter()
+            if not await client.connect():
+                raise RuntimeError(f"Socket {index} was rejected")
+            connect_ms.append((time.perf_counter() - start) * 1000)
+            clients.append(client)
+
+        async def listen(index, client):
+            nonlocal delivered
+            while True:
+                data = json.loads(await client.receive())
+                _, origin, sent_at = data["message"].split(":")
+                if int(origin) != index:
+                    delivery_ms.append((time.perf_counter() - float(sent_at)) * 1000)
+                    delivered += 1
+
+        async def talk(index, client, deadline):
+            nonlocal sent
+            # Stagger sockets so they do not all fire on the same tick.
+            await asyncio.sleep(interval * index / len(clients))
+            while time.perf_counter() < deadline:
+                await client.send(
+                    json.dumps({"message": f"bench:{index}:{time.perf_counter()}"})
+                )
+                sent += 1
+                await asyncio.sleep(interval)
+
+        count_messages = sync_to_async(Message.objects.count)
+        messages_before = await count_messages()
+        listeners = [
+            asyncio.create_task(listen(i, client)) for i, client in enumerate(clients)
+        ]
+        started = time.perf_counter()
+        deadline = started + duration
+        await asyncio.gather(
+            *(talk(i, client, deadline) for i, client in enumerate(clients))
+        )
+        # Let in-flight broadcasts land before tearing the sockets down.
+        await asyncio.sleep(1)
+        for listener in listeners:
+            listener.cancel()
+        for client in clients:
+            await client.close()
+
+        # Disconnect flushes the write-behind buffers; wait for them to land.
+        persisted = await count_messages() - messages_before
+        settle_deadline = time.perf_counter() + 10
+        while persisted < sent and time.perf_counter() < settle_deadline:
+            await asyncio.sleep(0.1)
+            persisted = await count_messages() - messages_before
+        elapsed = time.perf_counter() - started
+
+        return {
+            "connect_latency_ms": latency_summary(connect_ms),
+            "delivery_latency_ms": latency_summary(delivery_ms),
+            "messages_sent": sent,
+            "messages_per_sec": round(sent / duration, 1),
+            "deliveries": delivered,
+            "deliveries_per_sec": round(delivered / duration, 1),
+            "db_writes": persisted,
+            "db_writes_per_sec": round(persisted / elapsed, 1),
+        }
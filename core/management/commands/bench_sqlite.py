@@ -0,0 +1,216 @@
+import datetime
+import json
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, close_old_connections, connection
+from django.db.backends.signals import connection_created
+from django.test.utils import override_settings
+
+from core import writer
+from core.benchmarks import latency_summary, scratch_database
+from core.models import ChatThread, CustomUser, Message, Period
+
+# What DATABASES and SQLITE_PRAGMAS amounted to before the production profile.
+BASELINE = {"pragmas": {}, "options": {}, "conn_max_age": 0, "single_writer": False}
+
+
+class Command(BaseCommand):
+    help = (
+        "Run a mixed read/write workload against a scratch SQLite file, first "
+        "with SQLite's defaults, then with the profile from settings, then "
+        "with writes sent through core.writer, and report throughput, "
+        "latency and lock errors as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--readers", type=int, default=8)
+        parser.add_argument("--writers", type=int, default=4)
+        parser.add_argument("--duration", type=float, default=10.0)
+        parser.add_argument("--output", help="Write the JSON report to this file.")
+
+    def handle(self, *args, **options):
+        database = settings.DATABASES["default"]
+        production = {
+            "pragmas": getattr(settings, "SQLITE_PRAGMAS", {}),
+            "options": database.get("OPTIONS", {}),
+            "conn_max_age": database.get("CONN_MAX_AGE", 0),
+            "single_writer": False,
+        }
+        profiles = {
+            "baseline": BASELINE,
+            "production": production,
+            "single_writer": {**production, "single_writer": True},
+        }
+        report = {
+            "readers": options["readers"],
+            "writers": options["writers"],
+            "duration_s": options["duration"],
+        }
+        for label, profile in profiles.items():
+            with tempfile.TemporaryDirectory() as tmp:
+                report[label] = self.run_profile(tmp, profile, options)
+
+        output = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                f.write(output + "\n")
+        self.stdout.write(output)
+
+    def run_profile(self, tmp, profile, options):
+        # Worker threads build their connections from this same dict.
+        settings_dict = connection.settings_dict
+        saved = settings_dict["OPTIONS"], settings_dict["CONN_MAX_AGE"]
+        settings_dict["OPTIONS"] = dict(profile["options"])
+        settings_dict["CONN_MAX_AGE"] = profile["conn_max_age"]
+        try:
+            with override_settings(
+                SQLITE_PRAGMAS=profile["pragmas"],
+                DB_SINGLE_WRITER=profile["single_writer"],
+            ):
+                with scratch_database(tmp):
+                    self.create_fixtures()
+                    report = self.workload(options)
+                    if profile["single_writer"]:
+                        report["writer"] = writer.stats()
+                    return report
+        finally:
+            settings_dict["OPTIONS"], settings_dict["CONN_MAX_AGE"] = saved
+
+    def create_fixtures(self):
+        users = CustomUser.objects.bulk_create(
+            [
+                CustomUser(
+                    email=f"bench{i}@example.com",
+                    full_name=f"Bench {i}",
+                    is_tutor=i < 20,
+                )
+                for i in range(60)
+            ]
+        )
+        self.tutors, self.students = users[:20], users[20:]
+        today = datetime.date.today()
+        self.periods = Period.objects.bulk_create(
+            [
+                Period(
+                    owner=tutor,
+                    day=today + datetime.timedelta(days=i // 4),
+                    start_time=datetime.time(8 + 2 * (i % 4)),
+                    end_time=datetime.time(9 + 2 * (i % 4)),
+                )
+                for tutor in self.tutors
+                for i in range(100)
+            ]
+        )
+        self.threads = [
+            ChatThread.objects.create(user1=tutor, user2=student)
+            for tutor, student in zip(self.tutors, self.students)
+        ]
+        Message.objects.bulk_create(
+            [
+                Message(thread=thread, sender=thread.user1, content=f"fixture {i}")
+                for thread in self.threads
+                for i in range(200)
+            ]
+        )
+
+    def read(self, index, step):
+        if step % 2:
+            tutor = self.tutors[(index + step) % len(self.tutors)]
+            today = datetime.date.today()
+            list(
+                Period.objects.filter(
+                    owner=tutor, day__range=(today, today + datetime.timedelta(28))
+                ).select_related("student")
+            )
+        else:
+            thread = self.threads[(index + step) % len(self.threads)]
+            list(Message.objects.filter(thread=thread).order_by("-id")[:30])
+
+    def write(self, index, step):
+        if step % 2:
+            # ChatConsumer.save_messages
+            thread = self.threads[(index + step) % len(self.threads)]
+            messages = [
+                Message(thread=thread, sender=thread.user2, content=f"bench {step}")
+                for _ in range(5)
+            ]
+
+            def save_messages():
+                Message.objects.bulk_create(messages)
+                thread.record_messages(messages)
+
+            writer.run(save_messages)
+        else:
+            # book_period followed by cancel_period
+            period = self.periods[(index * 7919 + step) % len(self.periods)]
+            student = self.students[index % len(self.students)]
+            writer.run(Period.book, period.pk, student)
+            writer.run(Period.cancel, period.pk, student)
+
+    def workload(self, options):
+        opened = 0
+
+        def count_connection(**kwargs):
+            nonlocal opened
+            opened += 1
+
+        latencies = {"reads": [], "writes": []}
+        errors = {"reads": 0, "writes": 0}
+        total = options["readers"] + options["writers"]
+        barrier = threading.Barrier(total + 1)
+        deadline = 0
+
+        def worker(kind, operation, index):
+            barrier.wait()
+            step = 0
+            try:
+                while time.perf_counter() < deadline:
+                    started = time.perf_counter()
+                    try:
+                        operation(index, step)
+                    except OperationalError:
+                        errors[kind] += 1
+                    else:
+                        latencies[kind].append((time.perf_counter() - started) * 1000)
+                    step += 1
+                    # What Django does at the end of every request.
+                    close_old_connections()
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=worker, args=("reads", self.read, i))
+            for i in range(options["readers"])
+        ] + [
+            threading.Thread(target=worker, args=("writes", self.write, i))
+            for i in range(options["writers"])
+        ]
+        connection_created.connect(count_connection)
+        try:
+            for thread in threads:
+                thread.start()
+            deadline = time.perf_counter() + options["duration"]
+            barrier.wait()
+            for thread in threads:
+                thread.join()
+        finally:
+            connection_created.disconnect(count_connection)
+
+        duration = options["duration"]
+        return {
+            "journal_mode": connection.cursor()
+            .execute("PRAGMA journal_mode")
+            .fetchone()[0],
+            "reads": len(latencies["reads"]),
+            "reads_per_sec": round(len(latencies["reads"]) / duration, 1),
+            "read_latency_ms": latency_summary(latencies["reads"]),
+            "writes": len(latencies["writes"]),
+            "writes_per_sec": round(len(latencies["writes"]) / duration, 1),
+            "write_latency_ms": latency_summary(latencies["writes"]),
+            "locked_errors": errors,
+            "connections_opened": opened,
+        }
@@ -0,0 +1,104 @@
+import datetime
+import posixpath
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from django.utils import timezone
+
+from core import avatars
+from core.models import Blob, CustomUser
+from core.storage import blob_fields, content_addressed_storage, release
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete content-addressed uploads and avatar sizes that nothing "
+        "references any more. Avatar sizes made before they were tracked are "
+        "registered by process_avatars --all."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--grace-hours",
+            type=float,
+            default=1.0,
+            help="Keep files stored more recently than this; the row that "
+            "will reference them may not have been saved yet.",
+        )
+        parser.add_argument(
+            "--recount",
+            action="store_true",
+            help="Recompute reference counts from the tables first, e.g. after "
+            "bulk updates that bypassed model signals.",
+        )
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - datetime.timedelta(hours=options["grace_hours"])
+        if options["recount"]:
+            self.recount()
+
+        orphans = Blob.objects.filter(references=0, stored_at__lt=cutoff)
+        blobs = freed = 0
+        # Deleting a picture releases its avatar sizes, which makes them
+        # orphans for another round.
+        more = True
+        while more:
+            more = False
+            for blob in list(orphans.all()):
+                if not options["dry_run"]:
+                    # The conditional delete loses to an upload that has just
+                    # resolved to this blob again.
+                    deleted, _ = Blob.objects.filter(
+                        name=blob.name, references=0, stored_at__lt=cutoff
+                    ).delete()
+                    if not deleted:
+                        continue
+                    content_addressed_storage.purge(blob.name)
+                    more |= self.release_derivatives(blob.name)
+                blobs += 1
+                freed += blob.size
+
+        verb = "Would delete" if options["dry_run"] else "Deleted"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {blobs} blobs ({freed} bytes)."))
+
+    def release_derivatives(self, name):
+        """Release the avatar sizes cut from the picture stored as ``name``."""
+        digest = avatars.stored_digest(name)
+        if digest is None:
+            return False
+        # The same bytes stored under another extension share the sizes.
+        stem = posixpath.splitext(name)[0]
+        if Blob.objects.filter(name__startswith=f"{stem}.").exists():
+            return False
+        release(avatars.derivative_names(digest))
+        return True
+
+    def blob_fields(self):
+        for model in apps.get_app_config("core").get_models():
+            for field in blob_fields(model):
+                yield model, field
+
+    def recount(self):
+        counts = {}
+        for model, field in self.blob_fields():
+            rows = (
+                model.objects.exclude(**{field.attname: ""})
+                .values_list(field.attname)
+                .annotate(n=Count("pk"))
+                .order_by()
+            )
+            for name, n in rows:
+                counts[name] = counts.get(name, 0) + n
+        # Avatar sizes are held once by the picture they were cut from.
+        digests = (
+            CustomUser.objects.exclude(avatar_digest="")
+            .values_list("avatar_digest", flat=True)
+            .distinct()
+        )
+        for digest in digests:
+            for name in avatars.derivative_names(digest):
+                counts[name] = 1
+        for name in list(Blob.objects.values_list("name", flat=True)):
+            Blob.objects.filter(name=name).update(references=counts.get(name, 0))
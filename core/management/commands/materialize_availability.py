@@ -0,0 +1,22 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+
+from core.models import AvailabilityRule
+from core.views import materialization_horizon
+
+
+class Command(BaseCommand):
+    help = (
+        "Materialize every tutor's recurring availability up to the furthest "
+        "date schedules can be browsed to, so availability search finds it. "
+        "Meant to run periodically, e.g. daily from cron."
+    )
+
+    def handle(self, *args, **options):
+        today = datetime.date.today()
+        horizon = materialization_horizon()
+        AvailabilityRule.materialize(None, today, horizon)
+        self.stdout.write(
+            self.style.SUCCESS(f"Materialized availability up to {horizon}.")
+        )
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+
+from core import avatars
+from core.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = "Generate the resized copies of profile pictures that do not have them yet."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Reprocess every picture, e.g. after changing avatars.SIZES.",
+        )
+
+    def handle(self, *args, **options):
+        users = CustomUser.objects.exclude(profile_picture="").exclude(
+            profile_picture__isnull=True
+        )
+        if not options["all"]:
+            users = users.filter(avatar_digest="")
+
+        # Many users share a file (the default picture at least), so each
+        # distinct file is read and resized once.
+        names = users.values_list("profile_picture", flat=True).distinct()
+        field = CustomUser._meta.get_field("profile_picture")
+        processed = 0
+        for name in list(names):
+            picture = field.attr_class(None, field, name)
+            try:
+                digest = avatars.process(picture)
+            except (OSError, ValueError) as e:
+                self.stderr.write(f"Skipping {name}: {e}")
+                continue
+            processed += users.filter(profile_picture=name).update(avatar_digest=digest)
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Processed {processed} profile pictures.")
+        )
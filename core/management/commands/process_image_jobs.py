@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core import image_jobs
+
+
+class Command(BaseCommand):
+    help = "Validate and resize uploaded profile pictures, then swap them in."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=10)
+        parser.add_argument("--max-attempts", type=int, default=5)
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=1.0,
+            help="Seconds to wait when nothing is due.",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Drain what is due now and exit instead of polling.",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            done, failed = image_jobs.process_due(
+                options["batch_size"], options["max_attempts"]
+            )
+            if done or failed:
+                self.stdout.write(f"Processed {done}, failed {failed}")
+            elif options["once"]:
+                return
+            else:
+                time.sleep(options["interval"])
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.models import AvailabilitySlot
+
+
+class Command(BaseCommand):
+    help = "Recompute the availability search index from the free periods."
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            rebuilt = AvailabilitySlot.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rebuilt} availability slots."))
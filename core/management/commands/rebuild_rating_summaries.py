@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.models import RatingSummary
+
+
+class Command(BaseCommand):
+    help = "Recompute every tutor's rating summary from the reviews table."
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            rebuilt = RatingSummary.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rebuilt} rating summaries."))
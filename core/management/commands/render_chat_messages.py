@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from core.models import Message
+from core.rendering import render_message_html
+
+
+class Command(BaseCommand):
+    help = "Store the rendered HTML of chat messages that do not have it yet."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Re-render every message, e.g. after changing the formatting rules.",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        messages = Message.objects.only("id", "content", "content_html").order_by("id")
+        if not options["all"]:
+            messages = messages.filter(content_html="")
+
+        rendered = 0
+        last_id = 0
+        while True:
+            batch = list(messages.filter(id__gt=last_id)[: options["batch_size"]])
+            if not batch:
+                break
+            for message in batch:
+                message.content_html = render_message_html(message.content)
+            Message.objects.bulk_update(batch, ["content_html"])
+            rendered += len(batch)
+            last_id = batch[-1].id
+
+        self.stdout.write(self.style.SUCCESS(f"Rendered {rendered} messages."))
@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core import outbox
+
+
+class Command(BaseCommand):
+    help = "Send queued emails from the outbox, retrying failures with backoff."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=50)
+        parser.add_argument("--max-attempts", type=int, default=8)
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=5.0,
+            help="Seconds to wait when nothing is due.",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Drain what is due now and exit instead of polling.",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            sent, failed = outbox.send_due(
+                options["batch_size"], options["max_attempts"]
+            )
+            if sent or failed:
+                self.stdout.write(f"Sent {sent}, failed {failed}")
+            elif options["once"]:
+                return
+            else:
+                time.sleep(options["interval"])
@@ -0,0 +1,65 @@
+import core.models
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def populate_index(apps, schema_editor):
+    Tutorship = apps.get_model("core", "Tutorship")
+    labels = dict(Tutorship._meta.get_field("name").choices)
+    rows = [
+        (t.pk, labels.get(t.name, t.name), t.description, t.tutor.full_name)
+        for t in Tutorship.objects.select_related("tutor")
+    ]
+    with schema_editor.connection.cursor() as cursor:
+        cursor.executemany(
+            "INSERT INTO core_tutorship_fts (rowid, course, description, tutor_name) "
+            "VALUES (%s, %s, %s, %s)",
+            rows,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0016_customuser_description"),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql=[
+                "CREATE VIRTUAL TABLE core_tutorship_fts USING fts5("
+                "course, description, tutor_name, "
+                "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')",
+                # Course and tutor matches outrank hits buried in descriptions.
+                "INSERT INTO core_tutorship_fts (core_tutorship_fts, rank) "
+                "VALUES ('rank', 'bm25(10.0, 1.0, 5.0)')",
+            ],
+            reverse_sql="DROP TABLE core_tutorship_fts",
+        ),
+        migrations.RunPython(populate_index, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name="TutorshipSearchEntry",
+            fields=[
+                (
+                    "tutorship",
+                    models.OneToOneField(
+                        db_column="rowid",
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        primary_key=True,
+                        related_name="search_entry",
+                        serialize=False,
+                        to="core.tutorship",
+                    ),
+                ),
+                (
+                    "document",
+                    core.models.SearchDocumentField(db_column="core_tutorship_fts"),
+                ),
+                ("rank", models.FloatField()),
+            ],
+            options={
+                "db_table": "core_tutorship_fts",
+                "managed": False,
+            },
+        ),
+    ]
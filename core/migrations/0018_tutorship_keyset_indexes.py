@@ -0,0 +1,21 @@
+# Generated by Django 5.2.7 on 2026-10-18 11:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_tutorship_fts'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='tutorship',
+            index=models.Index(fields=['created_at', 'id'], name='tutorship_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tutorship',
+            index=models.Index(fields=['tutor', 'created_at', 'id'], name='tutorship_tutor_created_idx'),
+        ),
+    ]
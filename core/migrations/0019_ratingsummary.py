@@ -0,0 +1,45 @@
+# Generated by Django 5.2.7 on 2026-10-18 11:28
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def build_summaries(apps, schema_editor):
+    Review = apps.get_model("core", "Review")
+    RatingSummary = apps.get_model("core", "RatingSummary")
+    summaries = {}
+    for review in Review.objects.only("reviewed_id", "rating"):
+        summary = summaries.setdefault(
+            review.reviewed_id, RatingSummary(user_id=review.reviewed_id)
+        )
+        summary.review_count += 1
+        summary.rating_sum += review.rating
+        field = f"rating_{review.rating}"
+        setattr(summary, field, getattr(summary, field) + 1)
+    RatingSummary.objects.bulk_create(summaries.values())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_tutorship_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RatingSummary',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='rating_summary', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('review_count', models.PositiveIntegerField(default=0)),
+                ('rating_sum', models.PositiveIntegerField(default=0)),
+                ('rating_0', models.PositiveIntegerField(default=0)),
+                ('rating_1', models.PositiveIntegerField(default=0)),
+                ('rating_2', models.PositiveIntegerField(default=0)),
+                ('rating_3', models.PositiveIntegerField(default=0)),
+                ('rating_4', models.PositiveIntegerField(default=0)),
+                ('rating_5', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(build_summaries, migrations.RunPython.noop),
+    ]
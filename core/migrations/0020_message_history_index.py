@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-18 11:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0019_ratingsummary"),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name="message",
+            options={"ordering": ("timestamp", "id")},
+        ),
+        migrations.AddIndex(
+            model_name="message",
+            index=models.Index(
+                fields=["thread", "timestamp", "id"], name="message_thread_time_idx"
+            ),
+        ),
+    ]
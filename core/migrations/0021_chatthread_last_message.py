@@ -0,0 +1,66 @@
+# Generated by Django 5.2.7 on 2026-10-18 11:33
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+from django.db.models.functions import Coalesce, Substr
+
+
+def backfill_last_message(apps, schema_editor):
+    ChatThread = apps.get_model("core", "ChatThread")
+    Message = apps.get_model("core", "Message")
+    latest = Message.objects.filter(thread=OuterRef("pk")).order_by(
+        "-timestamp", "-id"
+    )[:1]
+    ChatThread.objects.update(
+        last_message_at=Subquery(latest.values("timestamp")),
+        last_message_preview=Coalesce(
+            Subquery(latest.values(preview=Substr("content", 1, 100))), models.Value("")
+        ),
+        last_sender=Subquery(latest.values("sender")),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0020_message_history_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="chatthread",
+            name="last_message_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="chatthread",
+            name="last_message_preview",
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddField(
+            model_name="chatthread",
+            name="last_sender",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="+",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="chatthread",
+            index=models.Index(
+                fields=["user1", "last_message_at"], name="thread_user1_last_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="chatthread",
+            index=models.Index(
+                fields=["user2", "last_message_at"], name="thread_user2_last_idx"
+            ),
+        ),
+        migrations.RunPython(backfill_last_message, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.7 on 2026-10-18 11:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0021_chatthread_last_message"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="chatthread",
+            name="user1_read_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="chatthread",
+            name="user1_unread",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="chatthread",
+            name="user2_read_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="chatthread",
+            name="user2_unread",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="customuser",
+            name="unread_messages",
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
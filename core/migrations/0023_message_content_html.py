@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 11:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0022_chat_unread_counters"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="message",
+            name="content_html",
+            field=models.TextField(blank=True),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.7 on 2026-10-18 11:36
+
+from django.db import migrations, models
+
+
+SIDE_FIELDS = ("unread", "read_at")
+
+
+def normalize_pairs(apps, schema_editor):
+    ChatThread = apps.get_model("core", "ChatThread")
+    Message = apps.get_model("core", "Message")
+
+    for thread in ChatThread.objects.filter(user1__gt=models.F("user2")):
+        canonical = ChatThread.objects.filter(
+            user1=thread.user2_id, user2=thread.user1_id
+        ).first()
+        if canonical is None:
+            # Swap the participants along with their per-side columns.
+            thread.user1_id, thread.user2_id = thread.user2_id, thread.user1_id
+            for field in SIDE_FIELDS:
+                first, second = f"user1_{field}", f"user2_{field}"
+                old_first = getattr(thread, first)
+                setattr(thread, first, getattr(thread, second))
+                setattr(thread, second, old_first)
+            thread.save()
+            continue
+
+        # Both orderings exist: fold the reversed thread into the canonical one.
+        Message.objects.filter(thread=thread).update(thread=canonical)
+        canonical.user1_unread += thread.user2_unread
+        canonical.user2_unread += thread.user1_unread
+        if thread.last_message_at and (
+            canonical.last_message_at is None
+            or thread.last_message_at > canonical.last_message_at
+        ):
+            canonical.last_message_at = thread.last_message_at
+            canonical.last_message_preview = thread.last_message_preview
+            canonical.last_sender_id = thread.last_sender_id
+        canonical.save()
+        thread.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0023_message_content_html"),
+    ]
+
+    operations = [
+        migrations.RunPython(normalize_pairs, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="chatthread",
+            constraint=models.CheckConstraint(
+                condition=models.Q(("user1__lt", models.F("user2"))),
+                name="chatthread_user1_lt_user2",
+            ),
+        ),
+    ]
@@ -0,0 +1,144 @@
+# Generated by Django 5.2.7 on 2026-10-18 11:48
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def build_index(apps, schema_editor):
+    Period = apps.get_model("core", "Period")
+    Tutorship = apps.get_model("core", "Tutorship")
+    AvailabilitySlot = apps.get_model("core", "AvailabilitySlot")
+    courses = {}
+    for tutor_id, course in Tutorship.objects.values_list(
+        "tutor_id", "name"
+    ).distinct():
+        courses.setdefault(tutor_id, []).append(course)
+    slots = []
+    for period in Period.objects.filter(student__isnull=True).iterator():
+        first = (period.start_time.hour * 60 + period.start_time.minute) // 60
+        last = (period.end_time.hour * 60 + period.end_time.minute - 1) // 60
+        for course in courses.get(period.owner_id, ()):
+            slots.extend(
+                AvailabilitySlot(
+                    course=course,
+                    day=period.day,
+                    bucket=bucket,
+                    period_id=period.pk,
+                    tutor_id=period.owner_id,
+                )
+                for bucket in range(first, last + 1)
+            )
+    AvailabilitySlot.objects.bulk_create(slots, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0026_availabilityrule"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AvailabilitySlot",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "course",
+                    models.CharField(
+                        choices=[
+                            ("calculo_i", "Cálculo I"),
+                            ("logica", "Lógica"),
+                            ("calculo_ii", "Cálculo II"),
+                            (
+                                "introduccion_a_la_informatica",
+                                "Introducción a la Informática",
+                            ),
+                            ("estadistica_descriptiva", "Estadística Descriptiva"),
+                            ("ingles_instrumental", "Inglés Instrumental"),
+                            ("calculo_iii", "Cálculo III"),
+                            ("fisica", "Física"),
+                            (
+                                "algoritmos_y_programacion_i",
+                                "Algoritmos y Programación I",
+                            ),
+                            ("algebra", "Álgebra"),
+                            (
+                                "inferencia_y_probabilidades",
+                                "Inferencia y Probabilidades",
+                            ),
+                            ("calculo_iv", "Cálculo IV"),
+                            ("estructuras_discretas", "Estructuras Discretas"),
+                            (
+                                "algoritmos_y_programacion_ii",
+                                "Algoritmos y Programación II",
+                            ),
+                            ("electronica", "Electrónica"),
+                            ("bases_de_datos_i", "Bases de Datos I"),
+                            (
+                                "algoritmos_y_programacion_iii",
+                                "Algoritmos y Programación III",
+                            ),
+                            ("bases_de_datos_ii", "Bases de Datos II"),
+                            ("metodos_numericos", "Métodos Numéricos"),
+                            (
+                                "principios_de_ingenieria_del_software",
+                                "Principios de Ingeniería del Software",
+                            ),
+                            ("arquitecturas_software", "Arquitecturas Software"),
+                            (
+                                "metodologias_de_desarrollo_de_software",
+                                "Metodologías de Desarrollo de Software",
+                            ),
+                            ("redes_y_comunicaciones_i", "Redes y Comunicaciones I"),
+                            (
+                                "desarrollo_de_aplicaciones_i",
+                                "Desarrollo de Aplicaciones I",
+                            ),
+                            ("redes_y_comunicaciones_ii", "Redes y Comunicaciones II"),
+                            (
+                                "desarrollo_de_aplicaciones_ii",
+                                "Desarrollo de Aplicaciones II",
+                            ),
+                        ],
+                        max_length=64,
+                    ),
+                ),
+                ("day", models.DateField()),
+                ("bucket", models.PositiveSmallIntegerField()),
+                (
+                    "period",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="core.period",
+                    ),
+                ),
+                (
+                    "tutor",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["course", "day", "bucket"],
+                        name="availability_lookup_idx",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(build_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-18 11:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0027_availabilityslot"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="customuser",
+            name="calendar_token",
+            field=models.CharField(max_length=43, null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name="period",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
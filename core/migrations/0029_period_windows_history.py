@@ -0,0 +1,60 @@
+# Generated by Django 5.2.7 on 2026-10-18 11:52
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0028_timetable_feed"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PeriodHistory",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("week", models.DateField(help_text="Monday of the archived week.")),
+                ("offered", models.PositiveIntegerField(default=0)),
+                ("booked", models.PositiveIntegerField(default=0)),
+                ("booked_minutes", models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="period",
+            index=models.Index(
+                fields=["owner", "day", "start_time"], name="period_owner_day_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="period",
+            index=models.Index(
+                fields=["student", "day", "start_time"], name="period_student_day_idx"
+            ),
+        ),
+        migrations.AddField(
+            model_name="periodhistory",
+            name="owner",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="period_history",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="periodhistory",
+            constraint=models.UniqueConstraint(
+                fields=("owner", "week"), name="periodhistory_owner_week"
+            ),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:00
+
+import core.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0031_imagejob"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="customuser",
+            name="profile_picture",
+            field=models.ImageField(
+                blank=True,
+                default="profile_pics/default.jpg",
+                null=True,
+                storage=core.storage.ContentAddressedStorage(),
+                upload_to="profile_pics/",
+            ),
+        ),
+        migrations.CreateModel(
+            name="Blob",
+            fields=[
+                (
+                    "name",
+                    models.CharField(max_length=255, primary_key=True, serialize=False),
+                ),
+                ("size", models.PositiveBigIntegerField()),
+                ("references", models.PositiveIntegerField(default=0)),
+                ("stored_at", models.DateTimeField()),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["references", "stored_at"], name="blob_orphan_idx"
+                    )
+                ],
+            },
+        ),
+    ]
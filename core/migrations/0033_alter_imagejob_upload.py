@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0032_content_addressed_media"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="imagejob",
+            name="upload",
+            field=models.FileField(blank=True, upload_to="uploads/"),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:36
+
+from django.db import migrations, models
+
+
+def drop_duplicate_periods(apps, schema_editor):
+    Period = apps.get_model("core", "Period")
+
+    seen = set()
+    duplicates = []
+    # Booked periods sort first, so a booking is never the copy dropped.
+    for pk, owner, day, start_time in Period.objects.order_by(
+        models.F("student").asc(nulls_last=True), "pk"
+    ).values_list("pk", "owner", "day", "start_time"):
+        if (owner, day, start_time) in seen:
+            duplicates.append(pk)
+        else:
+            seen.add((owner, day, start_time))
+    Period.objects.filter(pk__in=duplicates).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0033_alter_imagejob_upload"),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicate_periods, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name="period",
+            name="period_owner_day_idx",
+        ),
+        migrations.AddConstraint(
+            model_name="period",
+            constraint=models.UniqueConstraint(
+                fields=("owner", "day", "start_time"), name="period_owner_day_uniq"
+            ),
+        ),
+    ]
@@ -1,12 +1,20 @@
+import datetime
+import secrets
+
 from django.contrib.auth.models import (
     AbstractUser,
     UserManager,
     PermissionsMixin,
     BaseUserManager,
 )
-from django.db import models
+from django.db import models, transaction
+from django.db.models.functions import Greatest, Least, NullIf
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
+from . import avatars
+from .storage import content_addressed_storage, stored_names
+
 
 class CustomUserManager(BaseUserManager):
     def create_user(self, email, password=None, **extra_fields):
@@ -33,13 +41,18 @@ class CustomUser(AbstractUser):
     email = models.EmailField("email address", max_length=254, unique=True)
     is_tutor = models.BooleanField(default=False)
     description = models.TextField("description", blank=True)
+    unread_messages = models.PositiveIntegerField(default=0)
+    calendar_token = models.CharField(max_length=43, unique=True, null=True)
 
     profile_picture = models.ImageField(
         upload_to="profile_pics/",
+        storage=content_addressed_storage,
         null=True,
         blank=True,
         default="profile_pics/default.jpg",
     )
+    # Digest naming the resized copies of profile_picture; see core.avatars.
+    avatar_digest = models.CharField(max_length=20, blank=True)
 
     objects = CustomUserManager()
     USERNAME_FIELD = "email"
@@ -48,6 +61,60 @@ class CustomUser(AbstractUser):
     def __str__(self):
         return self.email
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # The blob reference signals only look up the stored file names
+        # when these have changed.
+        instance._loaded_names = stored_names(instance)
+        return instance
+
+    def save(self, *args, **kwargs):
+        # The blob reference signals read the old file names in pre_save and
+        # adjust their counts in post_save; one transaction keeps another
+        # save from changing the row in between.
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+    def get_calendar_token(self):
+        """The secret that authenticates this user's timetable feed URL."""
+        if not self.calendar_token:
+            self.calendar_token = secrets.token_urlsafe(32)
+            self.save(update_fields=["calendar_token"])
+        return self.calendar_token
+
+    def process_avatar(self):
+        """Generate the resized copies of the current profile picture."""
+        self.avatar_digest = (
+            avatars.process(self.profile_picture) if self.profile_picture else ""
+        )
+        CustomUser.objects.filter(pk=self.pk).update(avatar_digest=self.avatar_digest)
+
+    def avatar_url(self, size, fmt="webp"):
+        """
+        URL of the profile picture at one of ``avatars.SIZES``. Until the
+        picture has been processed this is the original upload.
+        """
+        if not self.avatar_digest:
+            return self.profile_picture.url
+        return avatars.url(self.avatar_digest, size, fmt)
+
+    @property
+    def avatar_small(self):
+        return self.avatar_url("small")
+
+    @property
+    def avatar_small_jpeg(self):
+        return self.avatar_url("small", "jpg")
+
+    @property
+    def avatar_large(self):
+        return self.avatar_url("large")
+
+    @property
+    def avatar_large_jpeg(self):
+        return self.avatar_url("large", "jpg")
+
 
 class Tutorship(models.Model):
     COURSE_CHOICES = [
@@ -89,6 +156,47 @@ class Tutorship(models.Model):
     description = models.TextField("Descripcion de la tutoria")
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["created_at", "id"], name="tutorship_created_idx"),
+            models.Index(
+                fields=["tutor", "created_at", "id"], name="tutorship_tutor_created_idx"
+            ),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # What the availability index depends on, so saves that keep it
+        # (e.g. description edits) can skip reindexing the tutor.
+        instance._loaded_course = (
+            instance.__dict__.get("name"),
+            instance.__dict__.get("tutor_id"),
+        )
+        return instance
+
+
+class SearchDocumentField(models.TextField):
+    pass
+
+
+class TutorshipSearchEntry(models.Model):
+    # Read-only view over the FTS5 table maintained by ``core.search``; the
+    # ``document`` column is the hidden column FTS5 names after the table.
+    tutorship = models.OneToOneField(
+        Tutorship,
+        on_delete=models.DO_NOTHING,
+        primary_key=True,
+        db_column="rowid",
+        related_name="search_entry",
+    )
+    document = SearchDocumentField(db_column="core_tutorship_fts")
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = "core_tutorship_fts"
+
 
 class Review(models.Model):
     author = models.ForeignKey(
@@ -102,6 +210,159 @@ class Review(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
 
 
+class RatingSummary(models.Model):
+    RATINGS = range(6)
+
+    user = models.OneToOneField(
+        CustomUser,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="rating_summary",
+    )
+    review_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_0 = models.PositiveIntegerField(default=0)
+    rating_1 = models.PositiveIntegerField(default=0)
+    rating_2 = models.PositiveIntegerField(default=0)
+    rating_3 = models.PositiveIntegerField(default=0)
+    rating_4 = models.PositiveIntegerField(default=0)
+    rating_5 = models.PositiveIntegerField(default=0)
+
+    @property
+    def average(self):
+        if not self.review_count:
+            return 0
+        return round(self.rating_sum / self.review_count, 1)
+
+    @property
+    def histogram(self):
+        return [(rating, getattr(self, f"rating_{rating}")) for rating in self.RATINGS]
+
+    @classmethod
+    def for_user(cls, user):
+        summary = cls.objects.filter(user=user).first()
+        return summary or cls(user=user)
+
+    @classmethod
+    def apply(cls, user, rating, delta):
+        """
+        Add (``delta=1``) or remove (``delta=-1``) one review with ``rating``
+        from ``user``'s summary. Must run in the same transaction as the
+        review write so the counters never drift from the reviews table.
+        """
+        cls.objects.get_or_create(user=user)
+        cls.objects.filter(user=user).update(
+            review_count=models.F("review_count") + delta,
+            rating_sum=models.F("rating_sum") + delta * rating,
+            **{f"rating_{rating}": models.F(f"rating_{rating}") + delta},
+        )
+
+    @classmethod
+    def rebuild(cls):
+        rows = (
+            Review.objects.values("reviewed_id", "rating")
+            .annotate(total=models.Count("id"))
+            .order_by()
+        )
+        summaries = {}
+        for row in rows:
+            summary = summaries.setdefault(
+                row["reviewed_id"], cls(user_id=row["reviewed_id"])
+            )
+            summary.review_count += row["total"]
+            summary.rating_sum += row["total"] * row["rating"]
+            field = f"rating_{row['rating']}"
+            setattr(summary, field, getattr(summary, field) + row["total"])
+        cls.objects.all().delete()
+        cls.objects.bulk_create(summaries.values())
+        return len(summaries)
+
+
+class OutboxEmail(models.Model):
+    """
+    An email waiting to be sent by the ``send_outbox`` worker. Rows are
+    written in the same transaction as the change they announce, so a
+    message is queued if and only if that change commits.
+    """
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=254)
+    recipients = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    next_attempt_at = models.DateTimeField()
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["sent_at", "next_attempt_at"], name="outbox_pending_idx"
+            ),
+        ]
+
+
+class Blob(models.Model):
+    """
+    A file stored by ``core.storage.ContentAddressedStorage``, or an avatar
+    size cut from one (see ``core.avatars``). ``references`` counts the rows
+    pointing at it; the ``gc_media`` command deletes blobs that have had
+    none for a while.
+    """
+
+    name = models.CharField(max_length=255, primary_key=True)
+    size = models.PositiveBigIntegerField()
+    references = models.PositiveIntegerField(default=0)
+    # Last time an upload resolved to this blob.
+    stored_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["references", "stored_at"], name="blob_orphan_idx"),
+        ]
+
+
+class ImageJob(models.Model):
+    """
+    An uploaded profile picture waiting for the ``process_image_jobs``
+    worker, which validates and resizes it before it replaces the user's
+    current picture. ``error`` is set, for the user to see, when the upload
+    is rejected. A job without an upload resizes the current picture.
+    """
+
+    user = models.ForeignKey(
+        CustomUser, on_delete=models.CASCADE, related_name="image_jobs"
+    )
+    upload = models.FileField(upload_to="uploads/", blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    next_attempt_at = models.DateTimeField()
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    error = models.CharField(max_length=255, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["finished_at", "next_attempt_at"], name="imagejob_pending_idx"
+            ),
+        ]
+
+    # How long a rejected upload keeps being reported on the profile page.
+    ERROR_VISIBLE_FOR = datetime.timedelta(days=1)
+
+    @classmethod
+    def latest_for(cls, user):
+        """The user's most recent upload, if it is pending or recently rejected."""
+        job = cls.objects.filter(user=user).exclude(upload="").order_by("-id").first()
+        if job is None or job.finished_at is None:
+            return job
+        if job.error and job.finished_at > timezone.now() - cls.ERROR_VISIBLE_FOR:
+            return job
+        return None
+
+
 class ChatThread(models.Model):
     user1 = models.ForeignKey(
         CustomUser, on_delete=models.CASCADE, related_name="chat_threads_as_user1"
@@ -109,9 +370,118 @@ class ChatThread(models.Model):
     user2 = models.ForeignKey(
         CustomUser, on_delete=models.CASCADE, related_name="chat_threads_as_user2"
     )
+    last_message_at = models.DateTimeField(null=True, blank=True)
+    last_message_preview = models.CharField(max_length=100, blank=True)
+    last_sender = models.ForeignKey(
+        CustomUser,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+    )
+    user1_unread = models.PositiveIntegerField(default=0)
+    user2_unread = models.PositiveIntegerField(default=0)
+    user1_read_at = models.DateTimeField(null=True, blank=True)
+    user2_read_at = models.DateTimeField(null=True, blank=True)
+
+    PREVIEW_LENGTH = 100
 
     class Meta:
         unique_together = ("user1", "user2")
+        constraints = [
+            models.CheckConstraint(
+                condition=models.Q(user1__lt=models.F("user2")),
+                name="chatthread_user1_lt_user2",
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=["user1", "last_message_at"], name="thread_user1_last_idx"
+            ),
+            models.Index(
+                fields=["user2", "last_message_at"], name="thread_user2_last_idx"
+            ),
+        ]
+
+    @classmethod
+    def between(cls, user_a, user_b):
+        """
+        Return the thread between two users, creating it if needed. Threads
+        always store the lower user id in ``user1``, so this is one probe of
+        the (user1, user2) unique index, and ``get_or_create`` settles the
+        race when both users open the chat at the same time.
+        """
+        user1, user2 = sorted([user_a, user_b], key=lambda u: u.pk)
+        thread, _ = cls.objects.get_or_create(user1=user1, user2=user2)
+        return thread
+
+    def side(self, user):
+        return "user1" if user.pk == self.user1_id else "user2"
+
+    def unread_for(self, user):
+        return getattr(self, f"{self.side(user)}_unread")
+
+    def record_messages(self, messages):
+        """
+        Point the thread's last-message metadata at the last of ``messages``
+        (unless a newer message has already been recorded) and bump the
+        unread counters of their recipients. Returns the ids of the users
+        whose unread totals changed.
+        """
+        last = messages[-1]
+        ChatThread.objects.filter(pk=self.pk).filter(
+            models.Q(last_message_at__isnull=True)
+            | models.Q(last_message_at__lte=last.timestamp)
+        ).update(
+            last_message_at=last.timestamp,
+            last_message_preview=last.content[: self.PREVIEW_LENGTH],
+            last_sender=last.sender,
+        )
+
+        received = {}
+        for message in messages:
+            recipient = "user2" if message.sender_id == self.user1_id else "user1"
+            received[recipient] = received.get(recipient, 0) + 1
+        for side, count in received.items():
+            field = f"{side}_unread"
+            ChatThread.objects.filter(pk=self.pk).update(
+                **{field: models.F(field) + count}
+            )
+            CustomUser.objects.filter(pk=getattr(self, f"{side}_id")).update(
+                unread_messages=models.F("unread_messages") + count
+            )
+        return [getattr(self, f"{side}_id") for side in received]
+
+    def mark_read(self, user, count=None, read_at=None):
+        """
+        Fold ``user``'s unread counter for the thread out of their total and
+        move their read cursor to the thread's last message. With ``count``,
+        only that many messages are folded out (one stored batch, the last
+        of which was sent at ``read_at``), so messages stored since stay
+        unread. Returns the user's new unread total.
+        """
+        side = self.side(user)
+        field = f"{side}_unread"
+        unread = ChatThread.objects.filter(pk=self.pk, **{f"{field}__gt": 0})
+        if count is None:
+            read = models.F(field)
+            read_at = models.F("last_message_at")
+        else:
+            read = Least(models.F(field), models.Value(count))
+        with transaction.atomic():
+            CustomUser.objects.filter(pk=user.pk).filter(models.Exists(unread)).update(
+                unread_messages=Greatest(
+                    models.F("unread_messages")
+                    - models.Subquery(unread.annotate(read=read).values("read")),
+                    models.Value(0),
+                )
+            )
+            unread.update(**{field: models.F(field) - read, f"{side}_read_at": read_at})
+        return (
+            CustomUser.objects.filter(pk=user.pk)
+            .values_list("unread_messages", flat=True)
+            .get()
+        )
 
     def get_ordered_users(self):
         return sorted([self.user1, self.user2], key=lambda u: u.id)
@@ -126,10 +496,16 @@ class Message(models.Model):
     )
     sender = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
     content = models.TextField()
+    content_html = models.TextField(blank=True)
     timestamp = models.DateTimeField(auto_now_add=True)
 
     class Meta:
-        ordering = ("timestamp",)
+        ordering = ("timestamp", "id")
+        indexes = [
+            models.Index(
+                fields=["thread", "timestamp", "id"], name="message_thread_time_idx"
+            ),
+        ]
 
     def __str__(self):
         return (
@@ -137,6 +513,97 @@ class Message(models.Model):
         )
 
 
+class AvailabilityRule(models.Model):
+    """
+    A weekly recurring slot, e.g. every Tuesday 14:00-16:00 until July.
+
+    Rules don't store their occurrences up front. ``materialize`` creates
+    the ``Period`` rows of a bounded window on demand, and
+    ``materialized_until`` records how far that has gone so each date is
+    materialized once: re-viewing a window costs one query, and periods the
+    tutor later deletes are not brought back.
+    """
+
+    WEEKDAY_CHOICES = [
+        (0, "Lunes"),
+        (1, "Martes"),
+        (2, "Miércoles"),
+        (3, "Jueves"),
+        (4, "Viernes"),
+        (5, "Sábado"),
+        (6, "Domingo"),
+    ]
+
+    owner = models.ForeignKey(
+        CustomUser, on_delete=models.CASCADE, related_name="availability_rules"
+    )
+    weekday = models.PositiveSmallIntegerField(choices=WEEKDAY_CHOICES)
+    start_time = models.TimeField()
+    end_time = models.TimeField()
+    starts_on = models.DateField()
+    ends_on = models.DateField(null=True, blank=True)
+    materialized_until = models.DateField(null=True, blank=True)
+
+    @classmethod
+    def materialize(cls, owner, start, end):
+        """
+        Make sure every occurrence of ``owner``'s rules (every tutor's when
+        ``owner`` is ``None``) between ``start`` and ``end`` (inclusive)
+        exists as a ``Period``. Dates before ``start`` that were never
+        materialized are skipped.
+        """
+        pending = cls.objects.filter(starts_on__lte=end)
+        if owner is not None:
+            pending = pending.filter(owner=owner)
+        pending = (
+            pending.filter(
+                models.Q(materialized_until__isnull=True)
+                | models.Q(materialized_until__lt=end)
+            )
+            .exclude(ends_on__lt=start)
+            .exclude(materialized_until__gte=models.F("ends_on"))
+        )
+        for rule in pending:
+            first = max(start, rule.starts_on)
+            if rule.materialized_until is not None:
+                first = max(first, rule.materialized_until + datetime.timedelta(1))
+            last = min(end, rule.ends_on) if rule.ends_on else end
+            with transaction.atomic():
+                # Advancing the marker with a conditional UPDATE claims the
+                # dates, so concurrent viewers never materialize them twice.
+                claimed = cls.objects.filter(
+                    pk=rule.pk, materialized_until=rule.materialized_until
+                ).update(materialized_until=end)
+                if claimed:
+                    # Occurrences clashing with an existing period are
+                    # skipped; ignore_conflicts leaves the new rows without
+                    # pks, so index what the rule now owns in the range.
+                    Period.objects.bulk_create(
+                        rule.occurrences(first, last), ignore_conflicts=True
+                    )
+                    AvailabilitySlot.index(
+                        rule.periods.filter(day__range=(first, last))
+                    )
+
+    def occurrences(self, first, last):
+        day = first + datetime.timedelta((self.weekday - first.weekday()) % 7)
+        while day <= last:
+            yield Period(
+                owner_id=self.owner_id,
+                rule=self,
+                day=day,
+                start_time=self.start_time,
+                end_time=self.end_time,
+            )
+            day += datetime.timedelta(7)
+
+    def __str__(self):
+        return (
+            f"{self.get_weekday_display()} {self.start_time:%H:%M}-"
+            f"{self.end_time:%H:%M}"
+        )
+
+
 class Period(models.Model):
     owner = models.ForeignKey(
         CustomUser, on_delete=models.CASCADE, related_name="tutor"
@@ -151,3 +618,250 @@ class Period(models.Model):
         blank=True,
         related_name="student",
     )
+    rule = models.ForeignKey(
+        AvailabilityRule,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="periods",
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            # Also serves as the owner/day lookup index, and lets
+            # materialization skip occurrences that already exist.
+            models.UniqueConstraint(
+                fields=["owner", "day", "start_time"], name="period_owner_day_uniq"
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=["student", "day", "start_time"], name="period_student_day_idx"
+            ),
+        ]
+
+    @classmethod
+    def book(cls, pk, student):
+        """
+        Book period ``pk`` for ``student`` if it is still free and not one of
+        their own. A single conditional UPDATE, so when several students race
+        for the same slot exactly one of them gets it. Returns whether this
+        call booked it.
+        """
+        with transaction.atomic():
+            booked = (
+                cls.objects.filter(pk=pk, student__isnull=True)
+                .exclude(owner=student)
+                .update(student=student, updated_at=timezone.now())
+            )
+            if booked:
+                AvailabilitySlot.objects.filter(period_id=pk).delete()
+        return bool(booked)
+
+    @classmethod
+    def cancel(cls, pk, user):
+        """
+        Release the booking on period ``pk`` if ``user`` is its tutor or the
+        booked student. Returns whether this call released it.
+        """
+        with transaction.atomic():
+            cancelled = (
+                cls.objects.filter(pk=pk, student__isnull=False)
+                .filter(models.Q(owner=user) | models.Q(student=user))
+                .update(student=None, updated_at=timezone.now())
+            )
+            if cancelled:
+                AvailabilitySlot.index(cls.objects.filter(pk=pk))
+        return bool(cancelled)
+
+
+class PeriodHistory(models.Model):
+    """
+    Booking statistics for a tutor's archived weeks. ``archive_periods``
+    folds past ``Period`` rows into one row per tutor and week here, then
+    deletes them.
+    """
+
+    owner = models.ForeignKey(
+        CustomUser, on_delete=models.CASCADE, related_name="period_history"
+    )
+    week = models.DateField(help_text="Monday of the archived week.")
+    offered = models.PositiveIntegerField(default=0)
+    booked = models.PositiveIntegerField(default=0)
+    booked_minutes = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["owner", "week"], name="periodhistory_owner_week"
+            ),
+        ]
+
+    @classmethod
+    def archive(cls, before, batch_size=1000):
+        """
+        Move up to ``batch_size`` periods dated before ``before`` into the
+        history table. Returns how many were archived. A week that was
+        partly archived in an earlier batch is merged into its row.
+        """
+        with transaction.atomic():
+            batch = list(
+                Period.objects.filter(day__lt=before)
+                .order_by("day", "id")
+                .values_list(
+                    "id", "owner_id", "student_id", "day", "start_time", "end_time"
+                )[:batch_size]
+            )
+            if not batch:
+                return 0
+            weeks = {}
+            for _, owner_id, student_id, day, start_time, end_time in batch:
+                key = (owner_id, day - datetime.timedelta(day.weekday()))
+                stats = weeks.setdefault(key, [0, 0, 0])
+                stats[0] += 1
+                if student_id is not None:
+                    stats[1] += 1
+                    stats[2] += (
+                        end_time.hour * 60
+                        + end_time.minute
+                        - start_time.hour * 60
+                        - start_time.minute
+                    )
+
+            existing = {
+                (row.owner_id, row.week): row
+                for row in cls.objects.filter(
+                    owner__in={owner for owner, _ in weeks},
+                    week__in={week for _, week in weeks},
+                )
+            }
+            rows = []
+            for (owner_id, week), (offered, booked, minutes) in weeks.items():
+                row = existing.get((owner_id, week)) or cls(
+                    owner_id=owner_id, week=week
+                )
+                row.offered += offered
+                row.booked += booked
+                row.booked_minutes += minutes
+                rows.append(row)
+            cls.objects.bulk_create(
+                rows,
+                update_conflicts=True,
+                unique_fields=["owner", "week"],
+                update_fields=["offered", "booked", "booked_minutes"],
+            )
+            Period.objects.filter(id__in=[row[0] for row in batch]).delete()
+        return len(batch)
+
+
+class AvailabilitySlot(models.Model):
+    """
+    Search index over free periods: one row per free period, course its
+    tutor teaches and hour-long bucket the period overlaps, so "who is free
+    for this course at this time" is a single probe of
+    ``availability_lookup_idx``.
+
+    Kept in step by ``Period.book`` and ``Period.cancel``, by the code that
+    creates periods, and by the tutorship signals; deleted periods take
+    their rows with them. ``rebuild`` recomputes everything.
+    """
+
+    BUCKET_MINUTES = 60
+
+    course = models.CharField(max_length=64, choices=Tutorship.COURSE_CHOICES)
+    day = models.DateField()
+    bucket = models.PositiveSmallIntegerField()
+    period = models.ForeignKey(Period, on_delete=models.CASCADE, related_name="+")
+    tutor = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name="+")
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["course", "day", "bucket"], name="availability_lookup_idx"
+            ),
+        ]
+
+    @classmethod
+    def bucket_for(cls, time):
+        return (time.hour * 60 + time.minute) // cls.BUCKET_MINUTES
+
+    @classmethod
+    def index(cls, periods):
+        """Add index rows for the free periods among ``periods``."""
+        periods = [period for period in periods if period.student_id is None]
+        owners = {period.owner_id for period in periods}
+        courses = {}
+        for tutor_id, course in (
+            Tutorship.objects.filter(tutor__in=owners)
+            .values_list("tutor_id", "name")
+            .distinct()
+        ):
+            courses.setdefault(tutor_id, []).append(course)
+
+        slots = []
+        for period in periods:
+            first = cls.bucket_for(period.start_time)
+            # The end time is exclusive: a period ending at 16:00 does not
+            # reach into the 16:00 bucket.
+            last = (
+                period.end_time.hour * 60 + period.end_time.minute - 1
+            ) // cls.BUCKET_MINUTES
+            for course in courses.get(period.owner_id, ()):
+                slots.extend(
+                    cls(
+                        course=course,
+                        day=period.day,
+                        bucket=bucket,
+                        period_id=period.pk,
+                        tutor_id=period.owner_id,
+                    )
+                    for bucket in range(first, last + 1)
+                )
+        cls.objects.bulk_create(slots, batch_size=500)
+
+    @classmethod
+    def reindex_tutor(cls, tutor_id):
+        with transaction.atomic():
+            cls.objects.filter(tutor_id=tutor_id).delete()
+            cls.index(Period.objects.filter(owner_id=tutor_id, student__isnull=True))
+
+    @classmethod
+    def rebuild(cls):
+        cls.objects.all().delete()
+        free = Period.objects.filter(student__isnull=True).order_by("pk")
+        for start in range(0, free.count(), 2000):
+            cls.index(free[start : start + 2000])
+        return cls.objects.count()
+
+    @classmethod
+    def search(cls, course, day, time):
+        """
+        Free periods for ``course`` on ``day`` around ``time``, best first:
+        periods that cover ``time`` before ones that only share its hour,
+        then by the tutor's average rating and number of reviews.
+        """
+        rating = models.ExpressionWrapper(
+            models.F("tutor__rating_summary__rating_sum")
+            * 1.0
+            / NullIf(models.F("tutor__rating_summary__review_count"), 0),
+            output_field=models.FloatField(),
+        )
+        covers = models.Case(
+            models.When(
+                period__start_time__lte=time, period__end_time__gt=time, then=0
+            ),
+            default=1,
+        )
+        return (
+            cls.objects.filter(course=course, day=day, bucket=cls.bucket_for(time))
+            .select_related("period", "tutor", "tutor__rating_summary")
+            .annotate(covers=covers, rating=rating)
+            .order_by(
+                "covers",
+                models.F("rating").desc(nulls_last=True),
+                models.F("tutor__rating_summary__review_count").desc(nulls_last=True),
+                "period__start_time",
+                "id",
+            )
+        )
@@ -0,0 +1,12 @@
+from channels.layers import get_channel_layer
+
+
+def user_group(user_id):
+    return f"notifications_{user_id}"
+
+
+async def push_unread(user_id, total):
+    """Send ``total`` to every notification socket ``user_id`` has open."""
+    await get_channel_layer().group_send(
+        user_group(user_id), {"type": "unread_update", "unread": total}
+    )
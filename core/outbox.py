@@ -0,0 +1,104 @@
+"""
+Transactional email outbox.
+
+``enqueue`` stores an email in ``OutboxEmail``; call it inside the
+transaction that makes the change the email announces. The ``send_outbox``
+management command drains the table with ``send_due``, which sends each
+batch over one backend connection and reschedules failures with
+exponential backoff.
+"""
+
+import datetime
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.utils import timezone
+
+from .models import OutboxEmail
+
+RETRY_DELAY = datetime.timedelta(seconds=30)
+MAX_RETRY_DELAY = datetime.timedelta(hours=1)
+# How long a claimed batch is reserved for the worker that claimed it. A
+# worker that dies mid-batch releases its rows when the lease runs out.
+LEASE = datetime.timedelta(minutes=5)
+
+
+def enqueue(subject, body, recipient_list, from_email=None):
+    return OutboxEmail.objects.create(
+        subject=subject,
+        body=body,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        recipients=list(recipient_list),
+        next_attempt_at=timezone.now(),
+    )
+
+
+def retry_delay(attempts):
+    return min(RETRY_DELAY * 2 ** (attempts - 1), MAX_RETRY_DELAY)
+
+
+def claim(batch_size, max_attempts):
+    """
+    Reserve up to ``batch_size`` due emails by pushing their next attempt
+    past the lease. The UPDATE only matches rows that are still due, so
+    concurrent workers never claim the same email.
+    """
+    now = timezone.now()
+    lease_until = now + LEASE
+    due = OutboxEmail.objects.filter(
+        sent_at__isnull=True, next_attempt_at__lte=now, attempts__lt=max_attempts
+    )
+    ids = list(
+        due.order_by("next_attempt_at", "id").values_list("id", flat=True)[:batch_size]
+    )
+    due.filter(id__in=ids).update(next_attempt_at=lease_until)
+    return list(
+        OutboxEmail.objects.filter(id__in=ids, next_attempt_at=lease_until).order_by(
+            "id"
+        )
+    )
+
+
+def send_due(batch_size=50, max_attempts=8):
+    """
+    Send one batch of due emails over a single connection. Returns
+    ``(sent, failed)``.
+    """
+    batch = claim(batch_size, max_attempts)
+    if not batch:
+        return 0, 0
+
+    sent, failed = [], []
+    connection = get_connection()
+    try:
+        connection.open()
+    except Exception as exc:
+        failed = [(email, exc) for email in batch]
+    else:
+        try:
+            for email in batch:
+                try:
+                    EmailMessage(
+                        subject=email.subject,
+                        body=email.body,
+                        from_email=email.from_email,
+                        to=email.recipients,
+                        connection=connection,
+                    ).send()
+                except Exception as exc:
+                    failed.append((email, exc))
+                else:
+                    sent.append(email.id)
+        finally:
+            connection.close()
+
+    now = timezone.now()
+    OutboxEmail.objects.filter(id__in=sent).update(sent_at=now, last_error="")
+    for email, exc in failed:
+        attempts = email.attempts + 1
+        OutboxEmail.objects.filter(id=email.id).update(
+            attempts=attempts,
+            next_attempt_at=now + retry_delay(attempts),
+            last_error=repr(exc),
+        )
+    return len(sent), len(failed)
@@ -0,0 +1,23 @@
+import re
+
+from django.utils.html import escape
+
+MEET_LINK_RE = re.compile(
+    r"(https?:\/\/(meet\.new|meet\.google\.com\/\S+))", re.IGNORECASE
+)
+BOLD_RE = re.compile(r"\*\*(.+?)\*\*")
+
+MEET_LINK_HTML = (
+    '<a href="{url}" class="link link-primary" target="_blank" '
+    'rel="noopener noreferrer">{url}</a>'
+)
+
+
+def render_message_html(text):
+    """
+    Turn a chat message into the HTML shown in the chat log: escaped text,
+    Google Meet links made clickable and ``**bold**`` spans.
+    """
+    html = escape(text)
+    html = MEET_LINK_RE.sub(lambda match: MEET_LINK_HTML.format(url=match[0]), html)
+    return BOLD_RE.sub(r"<strong>\1</strong>", html)
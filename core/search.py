@@ -0,0 +1,70 @@
+import re
+
+from django.db import connection
+from django.db.models import F, Lookup
+
+from .models import SearchDocumentField
+
+FTS_TABLE = "core_tutorship_fts"
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+@SearchDocumentField.register_lookup
+class Match(Lookup):
+    lookup_name = "match"
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f"{lhs} MATCH {rhs}", (*lhs_params, *rhs_params)
+
+
+def match_expression(query):
+    # Every word the user typed becomes a quoted prefix term, so "calc"
+    # matches "Cálculo" and FTS5 operators typed by users are neutralized.
+    tokens = TOKEN_RE.findall(query)
+    return " ".join(f'"{token}"*' for token in tokens)
+
+
+def index_tutorship(tutorship):
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [tutorship.pk])
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, course, description, tutor_name) "
+            "VALUES (%s, %s, %s, %s)",
+            [
+                tutorship.pk,
+                tutorship.get_name_display(),
+                tutorship.description,
+                tutorship.tutor.full_name,
+            ],
+        )
+
+
+def remove_tutorship(tutorship_id):
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [tutorship_id])
+
+
+def update_tutor_name(tutor):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"UPDATE {FTS_TABLE} SET tutor_name = %s "
+            "WHERE rowid IN (SELECT id FROM core_tutorship WHERE tutor_id = %s)",
+            [tutor.full_name, tutor.pk],
+        )
+
+
+def search_tutorships(queryset, query):
+    """
+    Filter ``queryset`` down to the tutorships matching ``query`` in the
+    FTS5 index and annotate them with ``search_rank`` (bm25, lower is better).
+    """
+    expression = match_expression(query)
+    if not expression:
+        return queryset.none().annotate(search_rank=F("search_entry__rank"))
+
+    return queryset.filter(search_entry__document__match=expression).annotate(
+        search_rank=F("search_entry__rank")
+    )
@@ -0,0 +1,73 @@
+"""
+Data and fragment cache for the chat sidebar in
+``layouts/base_with_chat_sidebar.html``.
+
+The rendered list is cached per user under a versioned key. Anything that
+changes what a user's sidebar shows (a message landing in one of their
+threads, a read, a new thread) calls ``invalidate`` for them, which sets a
+new random version so the next page render rebuilds the fragment. Versions
+are written with a plain ``set`` rather than ``incr``, which is a
+read-modify-write on most backends: two processes invalidating at once
+still each leave a version nobody has cached under. A render that
+races with an invalidation can only store its fragment under the old
+version, which nobody reads again.
+
+The cache has to be shared by every process that renders pages or writes
+messages, or an invalidation made in one is never seen by the others;
+settings use a file-based cache for that.
+"""
+
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F, Q
+from django.template.loader import render_to_string
+
+from .models import ChatThread
+
+
+def recent_threads(user):
+    """
+    Return ``user``'s threads, most recently active first, in one query.
+    Each thread carries the other participant as ``other_user`` and
+    ``user``'s unread count as ``unread``.
+    """
+    threads = list(
+        ChatThread.objects.filter(Q(user1=user) | Q(user2=user))
+        .select_related("user1", "user2")
+        .order_by(F("last_message_at").desc(nulls_last=True), "-id")
+    )
+    for thread in threads:
+        thread.other_user = thread.user2 if thread.user1_id == user.pk else thread.user1
+        thread.unread = thread.unread_for(user)
+    return threads
+
+
+def _version_key(user_id):
+    return f"chat_sidebar_version:{user_id}"
+
+
+def _new_version():
+    return uuid.uuid4().hex
+
+
+def render(request):
+    user = request.user
+    version = cache.get_or_set(_version_key(user.pk), _new_version, None)
+    key = f"chat_sidebar:{user.pk}:{version}"
+    html = cache.get(key)
+    if html is None:
+        html = render_to_string(
+            "partials/chat_sidebar.html",
+            {"recent_threads": recent_threads(user)},
+            request=request,
+        )
+        cache.set(key, html, getattr(settings, "CHAT_SIDEBAR_CACHE_TIMEOUT", 300))
+    return html
+
+
+def invalidate(user_ids):
+    cache.set_many(
+        {_version_key(user_id): _new_version() for user_id in user_ids}, None
+    )
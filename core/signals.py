@@ -1,7 +1,15 @@
+from django.conf import settings
 from django.contrib.auth.models import Group
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
 from django.dispatch import receiver
 from allauth.account.signals import user_signed_up
 
+from . import image_jobs
+from . import search
+from . import storage
+from .models import AvailabilitySlot, CustomUser, Tutorship
+
 
 @receiver(user_signed_up)
 def assign_group_on_signup(request, user, **kwargs):
@@ -19,3 +27,102 @@ def assign_group_on_signup(request, user, **kwargs):
         print(
             f"⚠️ Warning: Group '{group_name}' not found. Please ensure it is created via migration."
         )
+
+
+@receiver(post_save, sender=Tutorship)
+def index_tutorship(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    search.index_tutorship(instance)
+
+
+@receiver(post_delete, sender=Tutorship)
+def unindex_tutorship(sender, instance, **kwargs):
+    search.remove_tutorship(instance.pk)
+
+
+@receiver(post_save, sender=Tutorship)
+def reindex_tutor_availability(
+    sender, instance, created, update_fields=None, raw=False, **kwargs
+):
+    # The courses a tutor teaches decide which index rows their periods get,
+    # so only saves that change a course or move it to another tutor matter.
+    if raw:
+        return
+    loaded = getattr(instance, "_loaded_course", None)
+    if not created:
+        if update_fields is not None and not {"name", "tutor"} & set(update_fields):
+            return
+        if loaded == (instance.name, instance.tutor_id):
+            return
+    AvailabilitySlot.reindex_tutor(instance.tutor_id)
+    if loaded and loaded[1] not in (None, instance.tutor_id):
+        AvailabilitySlot.reindex_tutor(loaded[1])
+    instance._loaded_course = (instance.name, instance.tutor_id)
+
+
+@receiver(post_delete, sender=Tutorship)
+def unindex_tutor_availability(sender, instance, **kwargs):
+    AvailabilitySlot.reindex_tutor(instance.tutor_id)
+
+
+@receiver(post_save, sender=CustomUser)
+def reindex_tutor_name(
+    sender, instance, created, update_fields=None, raw=False, **kwargs
+):
+    if raw or created or not instance.is_tutor:
+        return
+    if update_fields is not None and "full_name" not in update_fields:
+        return
+    search.update_tutor_name(instance)
+
+
+@receiver(post_save, sender=CustomUser)
+def process_new_user_avatar(sender, instance, created, raw=False, **kwargs):
+    # Resizing runs in the process_image_jobs worker, not during signup.
+    if raw or not created or instance.avatar_digest:
+        return
+    image_jobs.enqueue(instance)
+
+
+@receiver(pre_save, sender=CustomUser)
+def read_stored_names(sender, instance, update_fields=None, **kwargs):
+    # CustomUser.save holds a transaction until count_blob_references runs.
+    # Names still as they were loaded aren't changing, so aren't looked up.
+    loaded = getattr(instance, "_loaded_names", {})
+    attnames = [
+        attname
+        for attname, name in storage.stored_names(instance).items()
+        if (update_fields is None or attname in update_fields)
+        and (attname not in loaded or loaded[attname] != name)
+    ]
+    instance._saved_names = storage.saved_names(instance, attnames)
+
+
+@receiver(post_save, sender=CustomUser)
+def count_blob_references(sender, instance, update_fields=None, **kwargs):
+    storage.update_references(instance, instance.__dict__.pop("_saved_names"))
+    saved = {
+        attname: name
+        for attname, name in storage.stored_names(instance).items()
+        if update_fields is None or attname in update_fields
+    }
+    instance._loaded_names = {**getattr(instance, "_loaded_names", {}), **saved}
+
+
+@receiver(pre_delete, sender=CustomUser)
+def release_blob_references(sender, instance, **kwargs):
+    # Sent inside the deletion's transaction.
+    attnames = [field.attname for field in storage.blob_fields(sender)]
+    names = storage.saved_names(instance, attnames)
+    storage.release(name for name in names.values() if name)
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    if connection.vendor != "sqlite":
+        return
+    pragmas = getattr(settings, "SQLITE_PRAGMAS", {})
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
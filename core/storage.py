@@ -0,0 +1,143 @@
+"""
+Content-addressed storage for uploaded media.
+
+``ContentAddressedStorage`` ignores the name a file is uploaded under and
+stores it as ``<upload_to>/<sha256[:2]>/<sha256><ext>``. Identical uploads
+resolve to one file, and a name never refers to different bytes, so its URL
+can be cached forever.
+
+Because files are shared, deleting one would break every other row that
+points at it. Each stored file has a ``Blob`` row whose ``references`` count
+is kept up to date by the signals in ``core.signals`` (``retain`` and
+``release``), which compare a row's names before and after each save;
+names still as they were when the row was loaded are not looked up. Files
+nobody references are removed by the ``gc_media`` management command,
+never directly.
+"""
+
+import collections
+import functools
+import hashlib
+import os
+import posixpath
+
+from django.core.files.storage import FileSystemStorage
+from django.db import models
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    def __init__(self, **kwargs):
+        # Two writers racing on one name are writing the same bytes.
+        kwargs.setdefault("allow_overwrite", True)
+        super().__init__(**kwargs)
+
+    def get_available_name(self, name, max_length=None):
+        # _save replaces the name with one derived from the content.
+        return name
+
+    def _save(self, name, content):
+        from .models import Blob
+
+        digest = hashlib.sha256()
+        size = 0
+        for chunk in content.chunks():
+            digest.update(chunk)
+            size += len(chunk)
+        digest = digest.hexdigest()
+        extension = os.path.splitext(name)[1].lower()
+        name = posixpath.join(
+            posixpath.dirname(name), digest[:2], f"{digest}{extension}"
+        )
+        if not self.exists(name):
+            name = super()._save(name, content)
+
+        # stored_at gives the upload a grace period in gc_media until the row
+        # that will reference it has been saved.
+        Blob.objects.bulk_create(
+            [Blob(name=name, size=size, stored_at=timezone.now())],
+            update_conflicts=True,
+            unique_fields=["name"],
+            update_fields=["stored_at"],
+        )
+        return name
+
+    def delete(self, name):
+        # Other rows may share the file; gc_media removes it once they don't.
+        pass
+
+    def purge(self, name):
+        super().delete(name)
+
+
+content_addressed_storage = ContentAddressedStorage()
+
+
+@functools.cache
+def blob_fields(model):
+    """The file fields of ``model`` that are kept in a ContentAddressedStorage."""
+    return [
+        field
+        for field in model._meta.concrete_fields
+        if isinstance(field, models.FileField)
+        and isinstance(field.storage, ContentAddressedStorage)
+    ]
+
+
+def by_count(names):
+    """Group ``names`` by how often each occurs: ``{count: [name, ...]}``."""
+    groups = {}
+    for name, count in collections.Counter(names).items():
+        groups.setdefault(count, []).append(name)
+    return groups
+
+
+def retain(names):
+    from .models import Blob
+
+    # One UPDATE per distinct count, which is almost always a single one.
+    for count, group in by_count(names).items():
+        Blob.objects.filter(name__in=group).update(references=F("references") + count)
+
+
+def release(names):
+    from .models import Blob
+
+    for count, group in by_count(names).items():
+        Blob.objects.filter(name__in=group).update(
+            references=Greatest(F("references") - count, 0)
+        )
+
+
+def stored_names(instance):
+    """Map each loaded blob field of ``instance`` to the name it holds."""
+    names = {}
+    for field in blob_fields(type(instance)):
+        # Deferred fields aren't fetched just for this, and aren't saved.
+        if field.attname in instance.__dict__:
+            value = instance.__dict__[field.attname]
+            names[field.attname] = getattr(value, "name", value) or None
+    return names
+
+
+def saved_names(instance, attnames):
+    """Map each of ``attnames`` to the name the database row of ``instance`` holds."""
+    row = None
+    if attnames and instance.pk is not None:
+        row = (
+            type(instance)
+            ._base_manager.filter(pk=instance.pk)
+            .values(*attnames)
+            .first()
+        )
+    return {attname: (row or {}).get(attname) or None for attname in attnames}
+
+
+def update_references(instance, old):
+    """Move references from the names in ``old`` to those ``instance`` now holds."""
+    new = stored_names(instance)
+    changed = [attname for attname, name in old.items() if new[attname] != name]
+    retain(new[attname] for attname in changed if new[attname])
+    release(old[attname] for attname in changed if old[attname])
@@ -1,7 +1,9 @@
 from django import template
 from django.contrib.auth import get_user_model
-import re
+from django.utils.html import format_html
 from django.utils.safestring import mark_safe
+from core import sidebar
+from core.rendering import render_message_html
 
 register = template.Library()
 User = get_user_model()
@@ -15,23 +17,45 @@ def get_other_user(thread, current_user):
 
 
 @register.filter
-def linkify(text):
-    meet_regex = re.compile(
-        r"(https?:\/\/(meet\.new|meet\.google\.com\/\S+))", re.IGNORECASE
-    )
-
-    def replace_url(match):
-        url = match.group(0)
-
-        return f'<a href="{url}" class="link link-primary" target="_blank" rel="noopener noreferrer">{url}</a>'
-
-    linked_text = meet_regex.sub(replace_url, text)
+def unread_for(thread, current_user):
+    return thread.unread_for(current_user)
 
-    linked_text = linked_text.replace("**", "<strong>")
 
-    return mark_safe(linked_text)
+@register.filter
+def linkify(text):
+    return mark_safe(render_message_html(text))
 
 
 @register.filter
 def get_item(dictionary, key):
     return dictionary.get(key)
+
+
+@register.simple_tag(takes_context=True)
+def chat_sidebar(context):
+    return sidebar.render(context["request"])
+
+
+@register.simple_tag
+def avatar(user, size="small", css_class="", alt=None):
+    """
+    ``<img>`` for ``user``'s profile picture at one of ``core.avatars.SIZES``,
+    wrapped in a ``<picture>`` that prefers the WebP copy once it exists.
+    """
+    if alt is None:
+        alt = user.full_name
+    if not user.avatar_digest:
+        return format_html(
+            '<img class="{}" src="{}" alt="{}" loading="lazy"/>',
+            css_class,
+            user.profile_picture.url,
+            alt,
+        )
+    return format_html(
+        '<picture><source srcset="{}" type="image/webp">'
+        '<img class="{}" src="{}" alt="{}" loading="lazy"/></picture>',
+        user.avatar_url(size),
+        css_class,
+        user.avatar_url(size, "jpg"),
+        alt,
+    )
@@ -1,3 +1,480 @@
-from django.test import TestCase
+import asyncio
+import base64
+import datetime
+import io
+import json
+import os
+import tempfile
+import threading
+from unittest import mock
 
-# Create your tests here.
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.test.utils import override_settings
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from . import avatars, image_jobs, routing
+from .forms import AvailabilityRuleForm
+from .layers import SQLiteChannelLayer
+from .models import (
+    AvailabilityRule,
+    AvailabilitySlot,
+    Blob,
+    ChatThread,
+    CustomUser,
+    Message,
+    Period,
+    Tutorship,
+)
+from .pagination import KeysetPaginator
+
+
+def forged_cursor(payload):
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+
+class KeysetPaginatorTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.tutor = CustomUser.objects.create_user(
+            email="tutor@example.com", password="pw", full_name="Tutor", is_tutor=True
+        )
+        for i in range(8):
+            Tutorship.objects.create(
+                name="logica", description=f"Tutoría {i}", tutor=cls.tutor
+            )
+
+    def paginator(self):
+        return KeysetPaginator(Tutorship.objects.all(), 3)
+
+    def test_pages_follow_each_other(self):
+        paginator = self.paginator()
+        seen = []
+        page = paginator.get_page()
+        while True:
+            seen.extend(page)
+            if not page.has_next():
+                break
+            page = paginator.get_page(page.next_cursor)
+        self.assertEqual(seen, list(Tutorship.objects.order_by("created_at", "id")))
+
+    def test_forged_cursors_fall_back_to_the_first_page(self):
+        first = list(self.paginator().get_page())
+        for payload in (
+            {"k": ["notadate", "x"], "d": "next"},
+            {"k": [{"a": 1}, 1], "d": "next"},
+            {"k": [[1], 1], "d": "prev"},
+            {"k": 5, "d": "next"},
+            ["k", "d"],
+        ):
+            with self.subTest(payload=payload):
+                page = self.paginator().get_page(forged_cursor(payload))
+                self.assertEqual(list(page), first)
+
+    def test_forged_cursor_is_not_a_server_error(self):
+        self.client.force_login(self.tutor)
+        cursor = forged_cursor({"k": ["notadate", "x"], "d": "next"})
+        response = self.client.get(reverse("tutorship"), {"cursor": cursor})
+        self.assertEqual(response.status_code, 200)
+
+
+class ChannelLayerLoadTests(SimpleTestCase):
+    """Concurrent group sends through two layers sharing one file, as two
+    worker processes would."""
+
+    senders = 6
+    messages = 40
+
+    def test_group_messages_are_neither_lost_nor_reordered(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            asyncio.run(self.load(os.path.join(tmp, "layer.sqlite3")))
+
+    async def load(self, path):
+        local = SQLiteChannelLayer(path=path, capacity=1000)
+        remote = SQLiteChannelLayer(path=path, capacity=1000)
+        channels = [await local.new_channel() for _ in range(4)]
+        for channel in channels:
+            await local.group_add("room", channel)
+
+        async def send(sender):
+            layer = local if sender % 2 else remote
+            for i in range(self.messages):
+                await layer.group_send("room", {"type": "x", "sender": sender, "i": i})
+
+        async def receive(channel):
+            return [
+                await local.receive(channel)
+                for _ in range(self.senders * self.messages)
+            ]
+
+        receivers = [asyncio.create_task(receive(channel)) for channel in channels]
+        await asyncio.gather(*(send(sender) for sender in range(self.senders)))
+        received = await asyncio.wait_for(asyncio.gather(*receivers), 30)
+        await local.close()
+        await remote.close()
+
+        for messages in received:
+            for sender in range(self.senders):
+                self.assertEqual(
+                    [m["i"] for m in messages if m["sender"] == sender],
+                    list(range(self.messages)),
+                )
+
+
+class ChatConsumerLoadTests(TransactionTestCase):
+    """Several sockets writing to one thread at once."""
+
+    sockets = 4
+    messages = 30
+
+    def test_messages_are_stored_and_delivered_in_order(self):
+        alice = CustomUser.objects.create_user("alice@example.com", "pw")
+        bob = CustomUser.objects.create_user("bob@example.com", "pw")
+        thread = ChatThread.objects.create(user1=alice, user2=bob)
+        with tempfile.TemporaryDirectory() as tmp, override_settings(
+            CHANNEL_LAYERS={
+                "default": {
+                    "BACKEND": "core.layers.SQLiteChannelLayer",
+                    # Room for every message: this checks delivery, not
+                    # backpressure.
+                    "CONFIG": {
+                        "path": os.path.join(tmp, "layer.sqlite3"),
+                        "capacity": 1000,
+                    },
+                }
+            },
+            CHAT_FLUSH_INTERVAL=0.02,
+            CHAT_FLUSH_BATCH_SIZE=7,
+        ):
+            received = asyncio.run(self.load(thread, [alice, bob]))
+
+        expected = [
+            f"{n}-{i}" for n in range(self.sockets) for i in range(self.messages)
+        ]
+        stored = list(
+            Message.objects.filter(thread=thread)
+            .order_by("id")
+            .values_list("content", flat=True)
+        )
+        self.assertCountEqual(stored, expected)
+        for messages in [stored, *received]:
+            for n in range(self.sockets):
+                self.assertEqual(
+                    [m for m in messages if m.startswith(f"{n}-")],
+                    [f"{n}-{i}" for i in range(self.messages)],
+                )
+        alice.refresh_from_db()
+        bob.refresh_from_db()
+        thread.refresh_from_db()
+        self.assertEqual(thread.user1_unread, alice.unread_messages)
+        self.assertEqual(thread.user2_unread, bob.unread_messages)
+
+    async def load(self, thread, users):
+        app = URLRouter(routing.websocket_urlpatterns)
+        sockets = []
+        for n in range(self.sockets):
+            socket = WebsocketCommunicator(app, f"/ws/chat/{thread.pk}/")
+            socket.scope["user"] = users[n % 2]
+            connected, _ = await socket.connect()
+            self.assertTrue(connected)
+            sockets.append(socket)
+
+        async def send(n):
+            for i in range(self.messages):
+                await sockets[n].send_json_to({"message": f"{n}-{i}"})
+
+        async def receive(socket):
+            return [
+                (await socket.receive_json_from(timeout=10))["message"]
+                for _ in range(self.sockets * self.messages)
+            ]
+
+        receivers = [asyncio.create_task(receive(socket)) for socket in sockets]
+        await asyncio.gather(*(send(n) for n in range(self.sockets)))
+        received = await asyncio.gather(*receivers)
+        for socket in sockets:
+            await socket.disconnect(timeout=5)
+        return received
+
+
+@override_settings(DB_SINGLE_WRITER=True)
+class SingleWriterChatConsumerLoadTests(ChatConsumerLoadTests):
+    """The same load with flushes and read receipts going through core.writer."""
+
+
+class BookingRaceTests(TransactionTestCase):
+    contenders = 40
+
+    def test_exactly_one_of_many_concurrent_bookings_wins(self):
+        tutor = CustomUser.objects.create_user("tutor@example.com", "pw", is_tutor=True)
+        students = CustomUser.objects.bulk_create(
+            [
+                CustomUser(email=f"student{i}@example.com")
+                for i in range(self.contenders)
+            ]
+        )
+        period = Period.objects.create(
+            owner=tutor,
+            day=datetime.date.today() + datetime.timedelta(days=1),
+            start_time=datetime.time(10),
+            end_time=datetime.time(11),
+        )
+        barrier = threading.Barrier(self.contenders)
+        results = []
+
+        def book(student):
+            barrier.wait()
+            try:
+                results.append((student.pk, Period.book(period.pk, student)))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=book, args=(s,)) for s in students]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        winners = [pk for pk, booked in results if booked]
+        self.assertEqual(len(results), self.contenders)
+        self.assertEqual(len(winners), 1)
+        period.refresh_from_db()
+        self.assertEqual(period.student_id, winners[0])
+
+
+class AvailabilityRuleTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.tutor = CustomUser.objects.create_user(
+            "tutor@example.com", "pw", is_tutor=True
+        )
+        today = datetime.date.today()
+        cls.monday = today + datetime.timedelta((7 - today.weekday()) % 7 + 7)
+
+    def form(self, start, end, **data):
+        return AvailabilityRuleForm(
+            {
+                "weekday": 0,
+                "start_time": start,
+                "end_time": end,
+                "starts_on": self.monday,
+                **data,
+            },
+            owner=self.tutor,
+        )
+
+    def test_overlapping_rules_are_rejected(self):
+        AvailabilityRule.objects.create(
+            owner=self.tutor,
+            weekday=0,
+            start_time=datetime.time(10),
+            end_time=datetime.time(12),
+            starts_on=self.monday,
+        )
+        self.assertFalse(self.form("11:00", "13:00").is_valid())
+        self.assertTrue(self.form("12:00", "13:00").is_valid())
+        self.assertTrue(
+            self.form(
+                "11:00", "13:00", weekday=1, ends_on=self.monday + datetime.timedelta(6)
+            ).is_valid()
+        )
+
+    def test_rules_overlapping_one_off_periods_are_rejected(self):
+        Period.objects.create(
+            owner=self.tutor,
+            day=self.monday + datetime.timedelta(7),
+            start_time=datetime.time(9),
+            end_time=datetime.time(10),
+        )
+        self.assertFalse(self.form("09:30", "11:00").is_valid())
+        self.assertTrue(
+            self.form(
+                "09:30", "11:00", ends_on=self.monday + datetime.timedelta(6)
+            ).is_valid()
+        )
+
+    def test_materialize_skips_existing_periods(self):
+        existing = Period.objects.create(
+            owner=self.tutor,
+            day=self.monday,
+            start_time=datetime.time(10),
+            end_time=datetime.time(11),
+        )
+        rule = AvailabilityRule.objects.create(
+            owner=self.tutor,
+            weekday=0,
+            start_time=datetime.time(10),
+            end_time=datetime.time(11),
+            starts_on=self.monday,
+        )
+        AvailabilityRule.materialize(
+            self.tutor, self.monday, self.monday + datetime.timedelta(13)
+        )
+        self.assertEqual(
+            list(
+                Period.objects.filter(owner=self.tutor)
+                .order_by("day")
+                .values_list("day", "rule")
+            ),
+            [
+                (existing.day, None),
+                (self.monday + datetime.timedelta(7), rule.pk),
+            ],
+        )
+
+    def test_search_is_read_only(self):
+        AvailabilityRule.objects.create(
+            owner=self.tutor,
+            weekday=0,
+            start_time=datetime.time(10),
+            end_time=datetime.time(11),
+            starts_on=self.monday,
+        )
+        Tutorship.objects.create(name="logica", description="x", tutor=self.tutor)
+        self.client.force_login(self.tutor)
+        search = {"course": "logica", "day": self.monday, "time": "10:30"}
+
+        response = self.client.get(reverse("availability_search"), search)
+        self.assertEqual(list(response.context["slots"]), [])
+        self.assertFalse(Period.objects.exists())
+
+        call_command("materialize_availability", stdout=io.StringIO())
+        response = self.client.get(reverse("availability_search"), search)
+        self.assertEqual(
+            [slot.period.day for slot in response.context["slots"]], [self.monday]
+        )
+
+    def test_only_course_changes_reindex_the_tutor(self):
+        tutorship = Tutorship.objects.create(
+            name="logica", description="x", tutor=self.tutor
+        )
+        tutorship = Tutorship.objects.get(pk=tutorship.pk)
+        with mock.patch.object(AvailabilitySlot, "reindex_tutor") as reindex:
+            tutorship.description = "y"
+            tutorship.save()
+            reindex.assert_not_called()
+            tutorship.name = "fisica"
+            tutorship.save()
+            reindex.assert_called_once_with(self.tutor.pk)
+
+    def test_feed_does_not_materialize(self):
+        AvailabilityRule.objects.create(
+            owner=self.tutor,
+            weekday=0,
+            start_time=datetime.time(10),
+            end_time=datetime.time(11),
+            starts_on=self.monday,
+        )
+        url = reverse("timetable_feed", args=[self.tutor.get_calendar_token()])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Period.objects.exists())
+
+
+class WindowTests(TestCase):
+    def test_start_is_clamped_to_browsable_dates(self):
+        tutor = CustomUser.objects.create_user("tutor@example.com", "pw", is_tutor=True)
+        self.client.force_login(tutor)
+        for start in ("0001-01-01", "0001-01-20", "9999-12-31", "not-a-date"):
+            with self.subTest(start=start):
+                response = self.client.get(reverse("timetable"), {"start": start})
+                self.assertEqual(response.status_code, 200)
+                self.assertGreaterEqual(
+                    response.context["previous_start"], datetime.date.min
+                )
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class AvatarTests(TestCase):
+    def picture(self, color):
+        buffer = io.BytesIO()
+        Image.new("RGB", (64, 48), color).save(buffer, "PNG")
+        return ContentFile(buffer.getvalue(), "upload.png")
+
+    def upload(self, user, color):
+        job = image_jobs.enqueue(user, self.picture(color))
+        image_jobs.process_due()
+        job.refresh_from_db()
+        self.assertIsNotNone(job.finished_at)
+        self.assertEqual(job.last_error, "")
+        user.refresh_from_db()
+
+    def gc(self):
+        call_command("gc_media", grace_hours=-1, stdout=io.StringIO())
+
+    def test_sizes_are_tracked_and_collected_with_their_picture(self):
+        user = CustomUser.objects.create_user("user@example.com", "pw")
+        self.upload(user, "red")
+        picture = user.profile_picture.name
+        self.assertEqual(
+            user.avatar_digest,
+            os.path.basename(picture)[: avatars.DIGEST_LENGTH],
+        )
+        sizes = avatars.derivative_names(user.avatar_digest)
+        self.assertEqual(
+            dict(Blob.objects.filter(name__in=sizes).values_list("name", "references")),
+            dict.fromkeys(sizes, 1),
+        )
+
+        call_command("gc_media", recount=True, dry_run=True, stdout=io.StringIO())
+        self.assertEqual(
+            Blob.objects.filter(name__in=[picture, *sizes], references=1).count(),
+            len(sizes) + 1,
+        )
+
+        self.upload(user, "blue")
+        self.gc()
+        self.assertFalse(Blob.objects.filter(name__in=[picture, *sizes]).exists())
+        for name in [picture, *sizes]:
+            self.assertFalse(default_storage.exists(name))
+        self.assertTrue(default_storage.exists(user.profile_picture.name))
+        self.assertTrue(
+            default_storage.exists(avatars.name(user.avatar_digest, "small", "webp"))
+        )
+
+    def references(self, *users):
+        return [
+            Blob.objects.get(name=user.profile_picture.name).references
+            for user in users
+        ]
+
+    def test_references_follow_uploads_and_deletions(self):
+        alice = CustomUser.objects.create_user("alice@example.com", "pw")
+        bob = CustomUser.objects.create_user("bob@example.com", "pw")
+        self.upload(alice, "red")
+        self.upload(bob, "red")
+        self.assertEqual(alice.profile_picture.name, bob.profile_picture.name)
+        self.assertEqual(self.references(alice), [2])
+
+        # The same bytes again resolve to the same blob.
+        self.upload(alice, "red")
+        self.assertEqual(self.references(alice), [2])
+
+        red = alice.profile_picture.name
+        self.upload(alice, "blue")
+        self.assertNotEqual(alice.profile_picture.name, red)
+        self.assertEqual(self.references(alice, bob), [1, 1])
+
+        bob.delete()
+        self.assertEqual(Blob.objects.get(name=red).references, 0)
+        self.assertEqual(self.references(alice), [1])
+
+    def test_saves_that_keep_the_picture_do_not_look_it_up(self):
+        user = CustomUser.objects.create_user("user@example.com", "pw")
+        self.upload(user, "red")
+        user = CustomUser.objects.get(pk=user.pk)
+        user.full_name = "Someone"
+        with CaptureQueriesContext(connection) as queries:
+            user.save()
+        self.assertFalse(
+            [q for q in queries if q["sql"].startswith("SELECT")],
+            queries.captured_queries,
+        )
+        self.assertEqual(self.references(user), [1])
@@ -0,0 +1,38 @@
+from django.conf import settings
+from django.core.files.uploadhandler import SkipFile, TemporaryFileUploadHandler
+
+
+class LimitedTemporaryFileUploadHandler(TemporaryFileUploadHandler):
+    """
+    Streams every uploaded file to a temporary file on disk, never into
+    memory, and drops any file as soon as it grows past
+    ``UPLOAD_MAX_FILE_SIZE`` bytes. The rest of that file is read and
+    discarded without being stored. Dropped fields are listed in
+    ``request.rejected_uploads`` so the view can tell the user.
+    """
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.max_size = getattr(settings, "UPLOAD_MAX_FILE_SIZE", 5 * 1024 * 1024)
+        if request is not None and not hasattr(request, "rejected_uploads"):
+            request.rejected_uploads = []
+
+    def new_file(self, field_name, *args, **kwargs):
+        super().new_file(field_name, *args, **kwargs)
+        self.received = 0
+        if self.content_length is not None and self.content_length > self.max_size:
+            self.reject()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > self.max_size:
+            self.reject()
+        return super().receive_data_chunk(raw_data, start)
+
+    def reject(self):
+        if hasattr(self, "file"):
+            self.file.close()
+            del self.file
+        if self.request is not None:
+            self.request.rejected_uploads.append(self.field_name)
+        raise SkipFile
@@ -15,17 +15,49 @@ urlpatterns = [
     path("review/delete/<int:pk>/", views.delete_review, name="delete_review"),
     path("account/profile", views.private_profile, name="private_profile"),
     path("account/edit/profile", views.profile_update_view, name="profile_update_view"),
+    path(
+        "account/profile/picture/status",
+        views.profile_picture_status,
+        name="profile_picture_status",
+    ),
     path("inbox/", views.inbox_view, name="inbox"),
+    path("ops/writer/", views.writer_stats, name="writer_stats"),
     path(
         "chat/<int:other_user_id>/", views.get_or_create_chat_thread, name="start_chat"
     ),
+    path(
+        "chat/thread/<int:thread_id>/messages/",
+        views.chat_history,
+        name="chat_history",
+    ),
     path("timetable/", views.timetable, name="timetable"),
     path("timetable/create", views.create_timetable, name="create_timetable"),
+    path("timetable/feed/<str:token>.ics", views.timetable_feed, name="timetable_feed"),
+    path(
+        "timetable/feed/reset/",
+        views.reset_timetable_feed,
+        name="reset_timetable_feed",
+    ),
+    path(
+        "timetable/availability/",
+        views.availability_rules,
+        name="availability_rules",
+    ),
+    path(
+        "timetable/availability/<int:pk>/delete/",
+        views.delete_availability_rule,
+        name="delete_availability_rule",
+    ),
     path(
         "tutor/<int:pk>/schedule/select/",
         views.tutor_schedule_select,
         name="tutor_schedule_select",
     ),
+    path(
+        "availability/search/",
+        views.availability_search,
+        name="availability_search",
+    ),
     path("period/<int:pk>/book/", views.book_period, name="book_period"),
     path("period/<int:pk>/cancel/", views.cancel_period, name="cancel_period"),
 ]
@@ -1,18 +1,30 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required, permission_required
+from django.contrib import messages
 from django.core.paginator import Paginator
-from django.http import HttpResponseRedirect
+from django.http import HttpResponseRedirect, JsonResponse, StreamingHttpResponse
 from django.urls import reverse
 from django.core.exceptions import PermissionDenied
 from . import models
 from . import forms
-from django.db.models import Q, Max, F
+from . import ical
+from . import image_jobs
+from . import notifications
+from . import outbox
+from . import search
+from . import sidebar
+from . import writer
+from .pagination import KeysetPaginator
+from django.db.models import Count, Max, Q
 from datetime import datetime, timedelta
+import time
 from collections import defaultdict
-from django.db.models import Avg
-from django.core.mail import send_mail
-from django.conf import settings
+from django.db import transaction
 from django.template.loader import render_to_string
+from django.conf import settings
+from asgiref.sync import async_to_sync
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
 
 DAY_MAP = {
     "lunes": "lunes_date",
@@ -34,6 +46,60 @@ WEEKDAYS_SPANISH = {
     6: "domingo",
 }
 
+CHAT_HISTORY_PAGE_SIZE = 30
+AVAILABILITY_SEARCH_LIMIT = 50
+
+
+def availability_window(start=None):
+    """
+    The dates a schedule page shows at once, starting at ``start`` (today by
+    default). Starting today, it is also how far ahead recurring
+    availability is materialized.
+    """
+    start = start or datetime.now().date()
+    weeks = getattr(settings, "AVAILABILITY_WINDOW_WEEKS", 4)
+    return start, start + timedelta(weeks=weeks, days=-1)
+
+
+def latest_window_start():
+    """
+    How far ahead schedule pages can be browsed: the window after the
+    default one. Viewing a window materializes availability up to its end,
+    so this also bounds that.
+    """
+    _, end = availability_window()
+    return end + timedelta(days=1)
+
+
+def materialization_horizon():
+    """The last date recurring availability is materialized up to."""
+    return availability_window(latest_window_start())[1]
+
+
+def requested_window(request):
+    """
+    The window starting at the ``start`` query parameter, or today. Starts
+    are clamped to ``latest_window_start()`` and, so the previous-window
+    link still has a date, to one window after ``date.min``.
+    """
+    try:
+        start = datetime.strptime(request.GET["start"], "%Y-%m-%d").date()
+    except (KeyError, ValueError):
+        return availability_window()
+    today, end = availability_window()
+    earliest = datetime.min.date() + (end - today) + timedelta(days=1)
+    return availability_window(min(max(start, earliest), latest_window_start()))
+
+
+def window_context(start, end):
+    return {
+        "window_start": start,
+        "window_end": end,
+        "previous_start": start - (end - start) - timedelta(days=1),
+        "next_start": end + timedelta(days=1),
+        "has_next": start < latest_window_start(),
+    }
+
 
 # Create your views here.
 def index(request):
@@ -52,22 +118,25 @@ def tutorships(request):
         tutorships_list = tutorships_list.filter(tutor=request.user)
 
     if search_query:
-        from django.db.models import Q
+        tutorships_list = search.search_tutorships(tutorships_list, search_query)
+        ordering = ("search_rank", "created_at", "id")
+    else:
+        ordering = ("created_at", "id")
 
-        tutorships_list = tutorships_list.filter(
-            Q(name__icontains=search_query) | Q(description__icontains=search_query)
-        )
+    tutorships_list = tutorships_list.select_related("tutor")
 
-    tutorships_list = tutorships_list.order_by("created_at")
-
-    paginator = Paginator(tutorships_list, 6)
-    page_number = request.GET.get("page")
-    page_obj = paginator.get_page(page_number)
+    paginator = KeysetPaginator(tutorships_list, 6, ordering=ordering)
+    page_obj = paginator.get_page(request.GET.get("cursor"))
 
     return render(
         request,
         "tutorship/index.html",
-        {"page_obj": page_obj, "search_query": search_query},
+        {
+            "page_obj": page_obj,
+            "paginator": paginator,
+            "search_query": search_query,
+            "show_my_tutorships": show_my_tutorships,
+        },
     )
 
 
@@ -131,15 +200,17 @@ def delete_tutorship(request, pk):
 def public_user(request, pk):
     tutor = get_object_or_404(models.CustomUser, pk=pk)
 
-    reviews = models.Review.objects.filter(reviewed=tutor).order_by("-created_at")
-    paginator = Paginator(reviews, 3)
+    summary = models.RatingSummary.for_user(tutor)
 
-    review_count = reviews.count()
-    if review_count > 0:
-        avg_rating = reviews.aggregate(Avg("rating"))["rating__avg"]
-        avg_rating = round(avg_rating, 1)
-    else:
-        avg_rating = 0
+    reviews = (
+        models.Review.objects.filter(reviewed=tutor)
+        .select_related("author")
+        .order_by("-created_at")
+    )
+    paginator = Paginator(reviews, 3)
+    # The summary already knows how many reviews there are; seeding the
+    # paginator's count keeps it from issuing its own COUNT(*).
+    paginator.count = summary.review_count
 
     page_number = request.GET.get("page")
     page_obj = paginator.get_page(page_number)
@@ -150,8 +221,9 @@ def public_user(request, pk):
         {
             "tutor": tutor,
             "page_obj": page_obj,
-            "review_count": review_count,
-            "avg_rating": avg_rating,
+            "review_count": summary.review_count,
+            "avg_rating": summary.average,
+            "rating_histogram": summary.histogram,
         },
     )
 
@@ -169,7 +241,12 @@ def create_review(request, pk):
             t = models.Review(
                 body=body, author=author, rating=rating, reviewed=reviewed
             )
-            t.save()
+
+            def save_review():
+                t.save()
+                models.RatingSummary.apply(reviewed, rating, 1)
+
+            writer.run(save_review)
 
             redirect_url = reverse("public_user", kwargs={"pk": reviewed.pk})
             return HttpResponseRedirect(redirect_url)
@@ -189,9 +266,19 @@ def edit_review(request, pk):
         form = forms.ReviewForm(request.POST)
 
         if form.is_valid():
+            old_rating = review_to_edit.rating
             review_to_edit.body = form.cleaned_data["body"]
             review_to_edit.rating = form.cleaned_data["rating"]
-            review_to_edit.save()
+
+            def save_review():
+                review_to_edit.save()
+                if old_rating != review_to_edit.rating:
+                    models.RatingSummary.apply(review_to_edit.reviewed, old_rating, -1)
+                    models.RatingSummary.apply(
+                        review_to_edit.reviewed, review_to_edit.rating, 1
+                    )
+
+            writer.run(save_review)
 
             redirect_url = reverse(
                 "public_user", kwargs={"pk": review_to_edit.reviewed.pk}
@@ -221,7 +308,12 @@ def delete_review(request, pk):
     if review.author != request.user:
         raise PermissionDenied()
     if request.method == "POST":
-        review.delete()
+
+        def remove_review():
+            review.delete()
+            models.RatingSummary.apply(review.reviewed, review.rating, -1)
+
+        writer.run(remove_review)
         redirect_url = reverse("public_user", kwargs={"pk": review.reviewed.pk})
         return HttpResponseRedirect(redirect_url)
     redirect_url = reverse("public_user", kwargs={"pk": review.reviewed.pk})
@@ -230,7 +322,26 @@ def delete_review(request, pk):
 
 @login_required
 def private_profile(request):
-    return render(request, "profile/private.html")
+    return render(
+        request,
+        "profile/private.html",
+        {"picture_job": models.ImageJob.latest_for(request.user)},
+    )
+
+
+@login_required
+def profile_picture_status(request):
+    """Polled by the profile page while an uploaded picture is processed."""
+    job = models.ImageJob.latest_for(request.user)
+    request.user.refresh_from_db(fields=["profile_picture", "avatar_digest"])
+    return JsonResponse(
+        {
+            "pending": job is not None and job.finished_at is None,
+            "error": job.error if job is not None else "",
+            "large": request.user.avatar_large,
+            "large_jpeg": request.user.avatar_large_jpeg,
+        }
+    )
 
 
 @login_required
@@ -238,16 +349,21 @@ def profile_update_view(request):
     user = request.user
     if request.method == "POST":
         form = forms.UserProfileUpdateForm(request.POST, request.FILES)
+        for field_name in getattr(request, "rejected_uploads", ()):
+            limit = settings.UPLOAD_MAX_FILE_SIZE // (1024 * 1024)
+            form.add_error(field_name, f"El archivo supera el máximo de {limit} MB.")
 
         if form.is_valid():
             new_full_name = form.cleaned_data["full_name"]
             new_profile_picture = form.cleaned_data.get("profile_picture")
             description = form.cleaned_data["description"]
             user.full_name = new_full_name
-            if new_profile_picture:
-                user.profile_picture = new_profile_picture
             user.description = description
-            user.save()
+            # The image worker may have replaced the picture since this
+            # request loaded the user.
+            user.save(update_fields=["full_name", "description"])
+            if new_profile_picture:
+                image_jobs.enqueue(user, new_profile_picture)
             return redirect("private_profile")
     else:
         initial_data = {
@@ -265,55 +381,97 @@ def get_or_create_chat_thread(request, other_user_id):
     if current_user == other_user:
         return redirect("inbox")
 
-    try:
-        thread = models.ChatThread.objects.get(
-            Q(user1=current_user, user2=other_user)
-            | Q(user1=other_user, user2=current_user)
+    thread = models.ChatThread.between(current_user, other_user)
+
+    if thread.unread_for(current_user):
+        current_user.unread_messages = writer.run(thread.mark_read, current_user)
+        async_to_sync(notifications.push_unread)(
+            current_user.id, current_user.unread_messages
         )
-    except models.ChatThread.DoesNotExist:
-        if current_user.id < other_user.id:
-            thread = models.ChatThread.objects.create(
-                user1=current_user, user2=other_user
-            )
-        else:
-            thread = models.ChatThread.objects.create(
-                user1=other_user, user2=current_user
-            )
+        sidebar.invalidate([current_user.id])
+    elif thread.last_message_at is None:
+        # New (or still empty) thread: make sure it shows up in both sidebars.
+        sidebar.invalidate([thread.user1_id, thread.user2_id])
 
-    messages = thread.messages.all()
+    chat_messages, next_cursor = message_history(thread)
 
-    recent_threads = (
-        models.ChatThread.objects.filter(Q(user1=current_user) | Q(user2=current_user))
-        .annotate(last_message_time=Max("messages__timestamp"))
-        .order_by(
-            F("last_message_time").desc(nulls_last=True),
-            "-id",
-        )
-    )
     context = {
         "thread": thread,
         "other_user": other_user,
-        "messages": messages,
-        "recent_threads": recent_threads,
+        "chat_messages": chat_messages,
+        "next_cursor": next_cursor,
     }
     return render(request, "chat/chat.html", context)
 
 
+def message_history(thread, cursor=None):
+    """
+    Return one page of ``thread``'s messages, oldest first, and the cursor of
+    the page before it (``None`` once the start of the thread is reached).
+    """
+    paginator = KeysetPaginator(
+        thread.messages.select_related("sender"),
+        CHAT_HISTORY_PAGE_SIZE,
+        ordering=("-timestamp", "-id"),
+    )
+    page = paginator.get_page(cursor)
+    return list(reversed(page.object_list)), page.next_cursor
+
+
 @login_required
-def inbox_view(request):
+def chat_history(request, thread_id):
     current_user = request.user
-    recent_threads = (
-        models.ChatThread.objects.filter(Q(user1=current_user) | Q(user2=current_user))
-        .annotate(last_message_time=Max("messages__timestamp"))
-        .order_by(
-            F("last_message_time").desc(nulls_last=True),
-            "-id",
-        )
+    thread = get_object_or_404(
+        models.ChatThread.objects.filter(Q(user1=current_user) | Q(user2=current_user)),
+        pk=thread_id,
     )
-    context = {
-        "recent_threads": recent_threads,
-    }
-    return render(request, "chat/inbox.html", context)
+    chat_messages, next_cursor = message_history(thread, request.GET.get("cursor"))
+    html = render_to_string(
+        "partials/chat_messages.html",
+        {"chat_messages": chat_messages},
+        request=request,
+    )
+    return JsonResponse({"html": html, "next_cursor": next_cursor})
+
+
+@login_required
+def writer_stats(request):
+    """Queue depth and commit batch sizes of the single writer, for staff."""
+    if not request.user.is_staff:
+        raise PermissionDenied()
+    return JsonResponse(writer.stats())
+
+
+@login_required
+def inbox_view(request):
+    return render(request, "chat/inbox.html")
+
+
+def timetable_periods(user, start, end):
+    """
+    The periods on ``user``'s timetable between ``start`` and ``end`` (the
+    ones they teach for tutors, the ones they booked otherwise) and the
+    timetable's title. Materializes a tutor's recurring availability first.
+    """
+    if getattr(user, "is_tutor", False):
+        today, upcoming_end = availability_window()
+        models.AvailabilityRule.materialize(
+            user, today, min(max(end, upcoming_end), materialization_horizon())
+        )
+    return stored_timetable_periods(user, start, end)
+
+
+def stored_timetable_periods(user, start, end):
+    """``timetable_periods`` over the rows already stored, materializing nothing."""
+    if getattr(user, "is_tutor", False):
+        periods_queryset = models.Period.objects.filter(
+            owner=user, day__range=(start, end)
+        ).order_by("day", "start_time")
+        return periods_queryset, "Mi Horario Completo"
+    periods_queryset = models.Period.objects.filter(
+        student=user, day__range=(start, end)
+    ).order_by("day", "start_time")
+    return periods_queryset, "Mis Clases Inscritas"
 
 
 @login_required
@@ -321,17 +479,9 @@ def timetable(request):
     user = request.user
 
     is_tutor = getattr(user, "is_tutor", False)
+    start, end = requested_window(request)
+    periods_queryset, schedule_title = timetable_periods(user, start, end)
 
-    if is_tutor:
-        periods_queryset = models.Period.objects.filter(owner=user).order_by(
-            "day", "start_time"
-        )
-        schedule_title = "Mi Horario Completo"
-    else:
-        periods_queryset = models.Period.objects.filter(student=user).order_by(
-            "day", "start_time"
-        )
-        schedule_title = "Mis Clases Inscritas"
     periods_by_day = {}
     for period in periods_queryset:
         day_key = period.day
@@ -346,17 +496,125 @@ def timetable(request):
         "sorted_days": sorted_days,
         "is_tutor": is_tutor,
         "schedule_title": schedule_title,
+        "feed_url": request.build_absolute_uri(
+            reverse("timetable_feed", args=[user.get_calendar_token()])
+        ),
+        **window_context(start, end),
     }
 
     return render(request, "timetable/index.html", context)
 
 
+def timetable_feed(request, token):
+    """
+    The timetable as an iCalendar feed, for calendar apps to subscribe to.
+    Authenticated by the token in the URL. The ETag and Last-Modified come
+    from one aggregate over the same periods, so polling clients get a 304
+    without the events being loaded. The events are streamed from an async
+    iterator, so the ASGI server sends them as they are read instead of
+    buffering the whole body.
+    """
+    user = get_object_or_404(models.CustomUser, calendar_token=token)
+    # The upcoming window plus one window of recent history.
+    today, end = availability_window()
+    start = today - (end - today) - timedelta(days=1)
+    # Polls only read: availability is materialized by the timetable pages
+    # and materialize_availability, never per feed request.
+    periods_queryset, schedule_title = stored_timetable_periods(user, start, end)
+    state = periods_queryset.aggregate(count=Count("id"), changed=Max("updated_at"))
+    changed = state["changed"].timestamp() if state["changed"] else 0
+    etag = quote_etag(f"{state['count']}-{changed}")
+    # HTTP dates have whole seconds. Round up past the last change, and send
+    # no Last-Modified until that second is over, so an edit made later in
+    # the same second can't be answered with a 304.
+    last_modified = int(changed) + 1
+    if last_modified > time.time():
+        last_modified = None
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        periods = periods_queryset.select_related("owner", "student").aiterator()
+        response = StreamingHttpResponse(
+            ical.timetable_lines(periods, user, schedule_title),
+            content_type="text/calendar; charset=utf-8",
+        )
+    response["ETag"] = etag
+    if last_modified is not None:
+        response["Last-Modified"] = http_date(last_modified)
+    return response
+
+
 @login_required
-def create_timetable(request):
+def reset_timetable_feed(request):
     if request.method == "POST":
-        models.Period.objects.filter(owner=request.user, student__isnull=True).delete()
+        request.user.calendar_token = None
+        request.user.get_calendar_token()
+    return redirect("timetable")
+
 
-        periods_to_create = []
+def find_overlap(slots):
+    """
+    Return the first pair of overlapping ``(day, start_time, end_time)``
+    slots, or ``None``. Sorting by day and start time means a slot can only
+    overlap the one that ends last before it on the same day, so one sweep
+    that tracks that latest end is enough.
+    """
+    previous = None
+    for slot in sorted(slots):
+        if previous and slot[0] == previous[0] and slot[1] < previous[2]:
+            return previous, slot
+        if not previous or slot[0] != previous[0] or slot[2] > previous[2]:
+            previous = slot
+    return None
+
+
+def save_timetable(user, submitted):
+    """
+    Make ``user``'s free manual periods match the ``(day, start, end)``
+    slots in ``submitted``. Returns the first overlapping pair instead of
+    saving anything if the slots overlap each other or a fixed period.
+    """
+    existing = models.Period.objects.filter(owner=user)
+    # Booked periods and those generated by availability rules are
+    # not part of the form, but new slots must not overlap them.
+    fixed = set(
+        existing.filter(Q(student__isnull=False) | Q(rule__isnull=False))
+        .filter(day__in={slot[0] for slot in submitted})
+        .values_list("day", "start_time", "end_time")
+    )
+    overlap = find_overlap(submitted + list(fixed))
+    if overlap:
+        return overlap
+
+    submitted = set(submitted)
+
+    free = {
+        (day, start_time, end_time): pk
+        for pk, day, start_time, end_time in existing.filter(
+            student__isnull=True, rule__isnull=True
+        ).values_list("pk", "day", "start_time", "end_time")
+    }
+    stale = [pk for slot, pk in free.items() if slot not in submitted]
+    if stale:
+        models.Period.objects.filter(pk__in=stale).delete()
+    created = models.Period.objects.bulk_create(
+        models.Period(
+            owner=user,
+            start_time=start_time,
+            end_time=end_time,
+            day=day,
+            student=None,
+        )
+        for day, start_time, end_time in sorted(submitted - free.keys())
+    )
+    models.AvailabilitySlot.index(created)
+    return None
+
+
+@login_required
+def create_timetable(request):
+    if request.method == "POST":
+        submitted = []
 
         for day, date_field_name in DAY_MAP.items():
             day_date_str = request.POST.get(date_field_name)
@@ -384,22 +642,26 @@ def create_timetable(request):
                             )
                             continue
 
-                        period = models.Period(
-                            owner=request.user,
-                            start_time=start_time,
-                            end_time=end_time,
-                            day=day_date,
-                            student=None,
-                        )
-                        periods_to_create.append(period)
+                        submitted.append((day_date, start_time, end_time))
                     except ValueError:
                         continue
 
-        models.Period.objects.bulk_create(periods_to_create)
+        overlap = writer.run(save_timetable, request.user, submitted)
+        if overlap:
+            first, second = overlap
+            messages.error(
+                request,
+                f"Los periodos {first[1]:%H:%M}-{first[2]:%H:%M} y "
+                f"{second[1]:%H:%M}-{second[2]:%H:%M} del "
+                f"{first[0]:%d/%m/%Y} se superponen.",
+            )
+            return redirect("create_timetable")
 
         return redirect("timetable")
-    existing_periods = models.Period.objects.filter(owner=request.user).order_by(
-        "day", "start_time"
+    existing_periods = (
+        models.Period.objects.filter(owner=request.user, rule__isnull=True)
+        .select_related("student")
+        .order_by("day", "start_time")
     )
 
     existing_periods_data = defaultdict(list)
@@ -441,6 +703,45 @@ def create_timetable(request):
     return render(request, "timetable/create.html", context)
 
 
+@login_required
+def availability_rules(request):
+    if not request.user.is_tutor:
+        raise PermissionDenied()
+    if request.method == "POST":
+        form = forms.AvailabilityRuleForm(request.POST, owner=request.user)
+        if form.is_valid():
+            models.AvailabilityRule.objects.create(
+                owner=request.user, **form.cleaned_data
+            )
+            # Make the new rule searchable right away rather than at the
+            # next materialize_availability run.
+            models.AvailabilityRule.materialize(
+                request.user, datetime.now().date(), materialization_horizon()
+            )
+            return redirect("availability_rules")
+    else:
+        form = forms.AvailabilityRuleForm(initial={"starts_on": datetime.now().date()})
+    rules = models.AvailabilityRule.objects.filter(owner=request.user).order_by(
+        "weekday", "start_time"
+    )
+    return render(
+        request, "timetable/availability.html", {"form": form, "rules": rules}
+    )
+
+
+@login_required
+def delete_availability_rule(request, pk):
+    rule = get_object_or_404(models.AvailabilityRule, pk=pk, owner=request.user)
+    if request.method == "POST":
+        with transaction.atomic():
+            # Booked occurrences stay; free upcoming ones go with the rule.
+            rule.periods.filter(
+                student__isnull=True, day__gte=datetime.now().date()
+            ).delete()
+            rule.delete()
+    return redirect("availability_rules")
+
+
 @login_required
 def tutor_schedule_select(request, pk):
 
@@ -449,8 +750,15 @@ def tutor_schedule_select(request, pk):
     if request.user == tutor:
         pass
 
+    today = datetime.now().date()
+    start, end = requested_window(request)
+    if start < today:
+        start, end = availability_window()
+    models.AvailabilityRule.materialize(
+        tutor, today, min(end, materialization_horizon())
+    )
     available_periods = models.Period.objects.filter(
-        owner=tutor, student__isnull=True
+        owner=tutor, student__isnull=True, day__range=(start, end)
     ).order_by("day", "start_time")
 
     periods_by_day = defaultdict(list)
@@ -463,31 +771,49 @@ def tutor_schedule_select(request, pk):
         "tutor": tutor,
         "periods_by_day": periods_by_day,
         "sorted_days": sorted_days,
+        "has_previous": start > today,
+        **window_context(start, end),
     }
 
     return render(request, "timetable/tutor_schedule_select.html", context)
 
 
 @login_required
-def book_period(request, pk):
-    period = get_object_or_404(models.Period, pk=pk)
+def availability_search(request):
+    form = forms.AvailabilitySearchForm(request.GET or None)
+    slots = []
+    if form.is_valid():
+        # Read-only: rules are materialized when saved and by the
+        # materialize_availability command, not by searches.
+        slots = models.AvailabilitySlot.search(
+            form.cleaned_data["course"],
+            form.cleaned_data["day"],
+            form.cleaned_data["time"],
+        )[:AVAILABILITY_SEARCH_LIMIT]
+    return render(
+        request, "timetable/availability_search.html", {"form": form, "slots": slots}
+    )
 
-    if period.student is not None:
-        return redirect("timetable")
 
-    if period.owner == request.user:
-        return redirect("timetable")
+@login_required
+def book_period(request, pk):
+    def book():
+        if not models.Period.book(pk, request.user):
+            return False
 
-    period.student = request.user
-    period.save()
+        period = models.Period.objects.select_related("owner").get(pk=pk)
+        period.student = request.user
 
-    # Send email notification to tutor
-    send_booking_email(period)
+        # Queue the notification to the tutor; send_outbox delivers it.
+        queue_booking_email(period)
+        return True
 
+    if not writer.run(book):
+        get_object_or_404(models.Period, pk=pk)
     return redirect("timetable")
 
 
-def send_booking_email(period):
+def queue_booking_email(period):
     subject = f"Nueva reserva de clase - {period.student.full_name}"
 
     context = {
@@ -502,13 +828,7 @@ def send_booking_email(period):
 
     message = render_to_string("emails/booking_notification.txt", context)
 
-    send_mail(
-        subject=subject,
-        message=message,
-        from_email=settings.DEFAULT_FROM_EMAIL,
-        recipient_list=[period.owner.email],
-        fail_silently=False,
-    )
+    outbox.enqueue(subject, message, [period.owner.email])
 
 
 @login_required
@@ -516,19 +836,7 @@ def cancel_period(request, pk):
     if request.method != "POST":
         return redirect("timetable")
 
-    period = get_object_or_404(models.Period, pk=pk)
-    user = request.user
-
-    is_owner = period.owner == user
-    is_student = period.student == user
-
-    if not is_owner and not is_student:
-        return redirect("timetable")
-
-    if period.student is None:
-        return redirect("timetable")
-
-    period.student = None
-    period.save()
+    if not writer.run(models.Period.cancel, pk, request.user):
+        get_object_or_404(models.Period, pk=pk)
 
     return redirect("timetable")
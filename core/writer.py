@@ -0,0 +1,179 @@
+"""
+Single-writer queue for SQLite.
+
+SQLite lets one connection write at a time, so concurrent requests that
+write just take turns on the lock, each paying for its own commit. With
+``DB_SINGLE_WRITER`` on, ``run`` and ``arun`` hand the write to one writer
+thread per process instead. The writer takes whatever is waiting, up to
+``DB_WRITER_MAX_BATCH`` calls, and commits them together in one
+transaction. Each call runs in its own savepoint, so a call that raises is
+rolled back alone and the exception is re-raised in its caller; the others
+in the batch still commit.
+
+A call returns only after its batch has committed, so callers see the
+same durability as with a plain ``transaction.atomic()``. Calls made from
+inside an open transaction, or from the writer itself, run inline: they
+can't be moved out of the transaction they belong to.
+
+Only writes that go through ``run`` or ``arun`` are batched: bookings and
+cancellations, reviews, timetable saves, chat message flushes and read
+receipts. Every other write still takes the SQLite lock directly, which is
+why the setting is off by default.
+
+Whatever thread calls ``run`` still uses its own connection for reads and
+for inline calls. Request threads and ``database_sync_to_async`` close
+stale connections for you. Other long-lived threads, such as a
+``ThreadPoolExecutor`` worker, must call ``close_old_connections()``
+around each job, as the writer thread does around each batch.
+
+``stats()`` reports queue depth and commit batch sizes; it is served to
+staff at ``ops/writer/``.
+"""
+
+import asyncio
+import collections
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+
+logger = logging.getLogger(__name__)
+
+# How many recent batches the size and latency figures in stats() cover.
+STATS_WINDOW = 1000
+
+
+def enabled():
+    return getattr(settings, "DB_SINGLE_WRITER", False)
+
+
+class Writer:
+    def __init__(self):
+        self.queue = queue.SimpleQueue()
+        self.thread = None
+        self.lock = threading.Lock()
+        self.submitted = 0
+        self.committed = 0
+        self.failed = 0
+        self.batches = 0
+        self.max_depth = 0
+        self.batch_sizes = collections.deque(maxlen=STATS_WINDOW)
+        self.depths = collections.deque(maxlen=STATS_WINDOW)
+        self.commit_ms = collections.deque(maxlen=STATS_WINDOW)
+
+    def submit(self, func, args, kwargs):
+        future = Future()
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(
+                    target=self.loop, name="db-writer", daemon=True
+                )
+                self.thread.start()
+            self.submitted += 1
+        self.queue.put((future, func, args, kwargs))
+        self.max_depth = max(self.max_depth, self.queue.qsize())
+        return future
+
+    def loop(self):
+        max_batch = getattr(settings, "DB_WRITER_MAX_BATCH", 64)
+        while True:
+            batch = [self.queue.get()]
+            self.depths.append(self.queue.qsize() + 1)
+            while len(batch) < max_batch:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            # Drop a connection that errored or outlived CONN_MAX_AGE, before
+            # and after each batch as Django does around a request.
+            close_old_connections()
+            try:
+                self.commit(batch)
+            finally:
+                close_old_connections()
+
+    def commit(self, batch):
+        started = time.perf_counter()
+        outcomes = []
+        try:
+            with transaction.atomic():
+                for future, func, args, kwargs in batch:
+                    try:
+                        with transaction.atomic():
+                            outcomes.append((True, func(*args, **kwargs)))
+                    except Exception as exc:
+                        outcomes.append((False, exc))
+        except Exception as exc:
+            # The commit itself failed, so nothing in the batch was written.
+            logger.exception("Writer batch of %d failed to commit", len(batch))
+            outcomes = [(False, exc)] * len(batch)
+
+        elapsed = (time.perf_counter() - started) * 1000
+        self.batches += 1
+        self.batch_sizes.append(len(batch))
+        self.commit_ms.append(elapsed)
+        logger.debug("Committed %d writes in %.1f ms", len(batch), elapsed)
+        for (future, *_), (ok, value) in zip(batch, outcomes):
+            if ok:
+                self.committed += 1
+                future.set_result(value)
+            else:
+                self.failed += 1
+                future.set_exception(value)
+
+    def inline(self):
+        return threading.current_thread() is self.thread or connection.in_atomic_block
+
+    def stats(self):
+        sizes = sorted(self.batch_sizes)
+        return {
+            "enabled": enabled(),
+            "queue_depth": self.queue.qsize(),
+            "max_queue_depth": self.max_depth,
+            "mean_queue_depth": (
+                round(sum(self.depths) / len(self.depths), 2) if self.depths else 0
+            ),
+            "submitted": self.submitted,
+            "committed": self.committed,
+            "failed": self.failed,
+            "batches": self.batches,
+            "mean_batch_size": round(sum(sizes) / len(sizes), 2) if sizes else 0,
+            "max_batch_size": sizes[-1] if sizes else 0,
+            "p50_batch_size": sizes[len(sizes) // 2] if sizes else 0,
+            "mean_commit_ms": (
+                round(sum(self.commit_ms) / len(self.commit_ms), 3)
+                if self.commit_ms
+                else 0
+            ),
+        }
+
+
+writer = Writer()
+
+
+def run_inline(func, *args, **kwargs):
+    with transaction.atomic():
+        return func(*args, **kwargs)
+
+
+def run(func, *args, **kwargs):
+    """Run ``func`` atomically on the writer and return its result."""
+    if not enabled() or writer.inline():
+        return run_inline(func, *args, **kwargs)
+    return writer.submit(func, args, kwargs).result()
+
+
+async def arun(func, *args, **kwargs):
+    """``run`` for async code; awaits the commit without blocking the loop."""
+    if not enabled():
+        return await database_sync_to_async(run_inline)(func, *args, **kwargs)
+    return await asyncio.wrap_future(writer.submit(func, args, kwargs))
+
+
+def stats():
+    return writer.stats()